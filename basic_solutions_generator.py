@@ -1,122 +1,222 @@
 import json
 import math
-import random
-from collections import defaultdict
-from functools import cmp_to_key
-from typing import Callable, Set, Dict, List, Tuple
+from typing import Collection, Dict, List, Sequence, Tuple, Union
 
-from tests import simple_tests_data
-from tests.tests_generator import plot_shops
+import numpy as np
 
+from batch_evaluation import evaluate_routes, pad_routes
+from problem_instance import ProblemInstance
+from random_streams import RandomStream, RandomStreams
+from route_improvement import improve_route
+from solution import Solution
 
-def generate(test_data: Dict, n: int = 1) -> List[Dict]:
+
+def generate(test_data: Union[Dict, ProblemInstance], n: int = 1, neighbours: int = 0,
+             improve: int = 0, seed: int = None) -> List[Dict]:
     """
     Find sample solutions that satisfy problem constraints.
 
-    :param test_data: dictionary with test data (start position, list, shops, weights)
+    :param test_data: dictionary with test data (start position, list, shops, weights) or compiled problem instance
     :param n: number of solutions to generate
+    :param neighbours: number of the nearest shops from which shops are selected (0 means all shops)
+    :param improve: maximal number of 2-opt and Or-opt moves improving each route (0 means no improvement)
+    :param seed: seed of the random numbers generator (None means fresh entropy)
     :return: list of dictionaries with calculated solution and its cost
     """
 
-    shops = {}
-    item_shops = defaultdict(list)
-    products_list = set(test_data['list'])
-    start = test_data['start']
-    weights = test_data['weights']
-
-    for shop in test_data['shops']:
-        shop['items'] = set(shop['items'])
-        shops[shop['id']] = shop
+    instance = ProblemInstance.of(test_data)
+    generator = SolutionGenerator(instance, neighbours, improve, seed)
+    return [solution.to_dict(instance) for solution in generator.generate(n)]
 
-        for item in shop['items']:
-            item_shops[item].append(shop)
 
-    solutions = []
+def select_shops(instance: ProblemInstance, neighbours: int = 0) -> Dict[int, int]:
+    """
+    From the list of all shops, select the shops that have in stock products from the list of products to buy.
 
-    for _ in range(n):
-        shops_list = select_shops(products_list, item_shops)
-        shops_list = order_shops(shops_list, shops, start)
-        cost = calculate_cost(shops_list, shops, start, weights)
+    :param instance: compiled problem instance
+    :param neighbours: if greater than 0, every shop is drawn from this number of shops that are nearest
+                       to the start point or to one of already selected shops
+    :return: dictionary with identifiers of selected shops and bitsets of products to buy in each shop
+    """
 
-        solutions.append({'solution': shops_list, 'cost': cost})
+    return SolutionGenerator(instance, neighbours).select_shops()
 
-    return solutions
 
+def order_shops(
+        shops_list: Dict[int, int],
+        instance: ProblemInstance
+) -> List[Tuple[int, List]]:
+    """
+    Heuristics for ordering list of selected shops.
 
-def select_shops(
-        products_list: Set,
-        item_shops: Dict[int, List[Dict]]
-) -> Dict[int, Set]:
+    :param shops_list: list of selected shops with bitsets of products to buy in each shop
+    :param instance: compiled problem instance
+    :return: ordered list of selected shops
     """
-    From the list of all shops, select the shops that have in stock products from the list of products to buy.
 
-    :param products_list: list of products to buy
-    :param item_shops: dictionary with all shops that have given item in stock
-    :return: dictionary with identifiers of selected shops and sets of products to buy in each shop
+    return SolutionGenerator(instance).order_shops(shops_list)
+
+
+class SolutionGenerator:
+    """
+    Generator of random solutions of one problem instance. It is created once and keeps everything it needs
+    from the instance, so the cost of generating solutions depends only on their number and lengths,
+    not on the size of the instance. The test data is never modified.
     """
 
-    products_list = products_list.copy()
-    result = {}
+    def __init__(self, instance: ProblemInstance, neighbours: int = 0, improve: int = 0, seed: int = None):
+        """
+        :param instance: compiled problem instance
+        :param neighbours: number of the nearest shops from which shops are selected (0 means all shops)
+        :param improve: maximal number of 2-opt and Or-opt moves improving each route (0 means no improvement)
+        :param seed: seed of the random numbers used if streams of scouts are not given (None means fresh entropy)
+        """
 
-    while len(products_list) > 0:
-        random_item = random.choice(list(products_list))
-        random_shop = random.choice(item_shops[random_item])
+        self.instance = instance
+        self.neighbours = neighbours
+        self.improve = improve
+        self.spatial_index = instance.spatial_index(neighbours) if neighbours > 0 else None
+        self.products = len(instance.item_list)
+        self.random = RandomStreams(seed)
 
-        result[random_shop['id']] = products_list & random_shop['items']
-        products_list = products_list - random_shop['items']
+        # a scout draws a permutation of products and at most two numbers for every selected shop
+        self.block = 3 * self.products + 8
 
-    return result
+    def streams(self, n: int) -> List[RandomStream]:
+        """
+        :param n: number of scouts
+        :return: streams of random numbers of scouts from the own generator
+        """
 
+        return self.random.streams([self.block] * n)
 
-def order_shops(
-        shops_list: Dict[int, Set],
-        shops: Dict[int, Dict],
-        start: Dict
-) -> List[Tuple[int, List]]:
-    """
-    Heuristics for ordering list of selected shops.
+    def generate(self, n: int = 1, streams: Sequence[RandomStream] = None) -> List[Solution]:
+        """
+        Find sample solutions that satisfy problem constraints.
 
-    :param shops_list: list of selected shops
-    :param shops: dictionary with all available shops
-    :param start: position of the start point
-    :return: ordered list of selected shops
-    """
+        :param n: number of solutions to generate
+        :param streams: streams of random numbers of scouts (None means streams from the own generator)
+        :return: list of solutions with calculated costs
+        """
+
+        if streams is None:
+            streams = self.streams(n)
+
+        routes = [self.drop_empty(self.order(self.select_shops(streams[i]))) for i in range(n)]
+
+        # costs of all solutions are calculated at once
+        costs, _ = evaluate_routes(self.instance, pad_routes(routes))
+
+        return [Solution(route, cost) for route, cost in zip(routes, costs.tolist())]
 
-    def det(a: Dict, b: Dict, c: Dict) -> float:
-        return a['x'] * b['y'] + a['y'] * c['x'] + b['x'] * c['y'] - c['x'] * b['y'] - c['y'] * a['x'] - b['x'] * a['y']
+    def drop_empty(self, route: np.ndarray) -> List[int]:
+        """
+        Remove shops in which nothing is bought - products are bought in the first shop on the route that
+        has them in stock (see Solution.items()), so after ordering a shop selected for its products can find
+        all of them already bought.
+
+        :param route: ordered identifiers of selected shops
+        :return: route without shops in which nothing is bought
+        """
+
+        products_mask = self.instance.full_mask
+        shop_masks = self.instance.shop_masks
+        result = []
+
+        for shop in route.tolist():
+            bought = products_mask & shop_masks[shop]
+            if bought:
+                result.append(shop)
+                products_mask ^= bought
+
+        return result
 
-    def det_start(shop_i: Tuple[int, List], shop_j: Tuple[int, List]) -> float:
-        return det(start, shops[shop_i[0]], shops[shop_j[0]])
+    def select_shops(self, stream: RandomStream = None) -> Dict[int, int]:
+        """
+        Select random shops that together have in stock all products from the list.
+
+        :param stream: stream of random numbers of the scout (None means a stream from the own generator)
+        :return: dictionary with identifiers of selected shops and bitsets of products to buy in each shop
+        """
+
+        if stream is None:
+            stream = self.streams(1)[0]
+
+        instance = self.instance
+        products_mask = instance.full_mask
+        result = {}
+        anchors = [0]
+
+        # taking the next product not bought yet from a random permutation of the list is the same
+        # as drawing a random product from products not bought yet, but does not rebuild any list
+        for k in stream.permutation(self.products):
+            if products_mask >> k & 1:
+                if self.spatial_index is not None:
+                    anchor = stream.choice(anchors)
+                    candidates = self.spatial_index.nearest_stocking(anchor, k, self.neighbours)
+                    random_shop = stream.choice(candidates.tolist())
+                    anchors.append(random_shop)
+                else:
+                    random_shop = stream.choice(instance.index_shops[k])
+
+                result[random_shop] = products_mask & instance.shop_masks[random_shop]
+                products_mask &= ~instance.shop_masks[random_shop]
 
-    def filter_shops(filter_func: Callable) -> List[Tuple[int, List]]:
-        result = filter(filter_func, shops_list.items())
-        result = map(lambda shop: (shop[0], list(shop[1])), result)
-        result = sorted(result, key=cmp_to_key(det_start))
         return result
 
-    upper_shops = filter_shops(lambda shop: shops[shop[0]]['y'] >= start['y'])
-    lower_shops = filter_shops(lambda shop: shops[shop[0]]['y'] < start['y'])
+    def order_shops(self, shops_list: Dict[int, int]) -> List[Tuple[int, List]]:
+        """
+        Heuristics for ordering list of selected shops.
 
-    return upper_shops + lower_shops
+        :param shops_list: list of selected shops with bitsets of products to buy in each shop
+        :return: ordered list of selected shops
+        """
+
+        return [(shop, self.instance.items_of(shops_list[shop])) for shop in self.order(shops_list).tolist()]
+
+    def order(self, shops: Collection[int]) -> np.ndarray:
+        """
+        Heuristics for ordering selected shops - clockwise sweep around the start point beginning
+        from the west (shops above the start point first, then shops below it), optionally improved
+        with 2-opt and Or-opt moves.
+
+        :param shops: identifiers of selected shops
+        :return: ordered identifiers of selected shops
+        """
+
+        positions = self.instance.positions
+        shops = np.fromiter(shops, dtype=np.int64, count=len(shops))
+
+        # polar angles of all shops are calculated at once and sorted by key instead of comparing pairs of shops
+        diff = positions[shops] - positions[0]
+        route = shops[np.argsort(-np.arctan2(diff[:, 1], diff[:, 0]), kind='stable')]
+
+        if self.improve > 0:
+            route = improve_route(self.instance, route, self.improve)
+
+        return route
 
 
 def calculate_cost(
         shops_list: List[Tuple[int, List]],
-        shops: Dict[int, Dict],
-        start: Dict,
-        weights: Dict[str, Dict]
+        shops: Union[Dict[int, Dict], ProblemInstance],
+        start: Dict = None,
+        weights: Dict[str, Dict] = None
 ) -> float:
     """
     Calculate the cost of a given solution based on our cost function:
     sum_{i=0}^{k-1} w_{i, i+1} * d_{i, i+1} + w_{k, 0} * d_{k, 0} + sum_{i=1}^{k} q_k
 
     :param shops_list: ordered list of selected shops
-    :param shops: dictionary with all available shops
-    :param start: position of the start point
-    :param weights: weights of roads between all shops
+    :param shops: dictionary with all available shops or compiled problem instance
+    :param start: position of the start point (not used with compiled problem instance)
+    :param weights: weights of roads between all shops (not used with compiled problem instance)
     :return: cost of a given solution
     """
 
+    if isinstance(shops, ProblemInstance):
+        return shops.route_cost(shop_id for shop_id, _ in shops_list)
+
     def dist(shop_i: Dict, shop_j: Dict) -> float:
         return math.sqrt((shop_i['x'] - shop_j['x']) ** 2 + (shop_i['y'] - shop_j['y']) ** 2)
 
@@ -140,8 +240,11 @@ if __name__ == '__main__':
     Find and print example solution that satisfies problem constraints.
     """
 
+    from visualisation import plot_shops
+
     with open('tests/data/normal2d.json', 'r') as file:
-        solution = generate(json.load(file))[0]
+        test_data = json.load(file)
+        solution = generate(test_data)[0]
 
-    plot_shops(simple_tests_data.normal2d, solution)
+    plot_shops(test_data, solution)
     print(solution)
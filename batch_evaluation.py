@@ -0,0 +1,68 @@
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from problem_instance import ProblemInstance
+
+
+def pad_routes(routes: Sequence[Sequence[int]]) -> np.ndarray:
+    """
+    Represent routes of different lengths as one integer array. Routes are padded with zeros - the start point
+    has no queue cost and no products, and going from the start point to itself costs nothing, so padding
+    does not change costs and coverage of the routes.
+
+    :param routes: list of ordered identifiers of visited shops
+    :return: array of shape (number of routes, length of the longest route)
+    """
+
+    lengths = np.fromiter(map(len, routes), dtype=np.int64, count=len(routes))
+    result = np.zeros((len(routes), lengths.max(initial=0)), dtype=np.int64)
+    result[np.arange(result.shape[1]) < lengths[:, np.newaxis]] = np.fromiter(
+        (shop for route in routes for shop in route), dtype=np.int64, count=lengths.sum())
+    return result
+
+
+def unpad_routes(routes: np.ndarray) -> List[List[int]]:
+    """
+    Convert padded array of routes back to lists of shop identifiers.
+
+    :param routes: padded array of routes
+    :return: list of ordered identifiers of visited shops
+    """
+
+    return [[shop for shop in route if shop != 0] for route in routes.tolist()]
+
+
+def clean_routes(instance: ProblemInstance, routes: np.ndarray) -> np.ndarray:
+    """
+    Skip shops that do not add anything to the products bought in the preceding shops on the route
+    (as in check_solution) and move the remaining shops to the front of the rows.
+
+    :param instance: compiled problem instance
+    :param routes: padded array of routes
+    :return: padded array of cleaned routes
+    """
+
+    stock = instance.stock[routes]
+    bought_before = np.logical_or.accumulate(stock, axis=1)
+    bought_before[:, 1:] = bought_before[:, :-1]
+    bought_before[:, 0] = False
+
+    keep = (stock & ~bought_before).any(axis=2)
+    order = np.argsort(~keep, axis=1, kind='stable')
+    return np.take_along_axis(np.where(keep, routes, 0), order, axis=1)
+
+
+def evaluate_routes(instance: ProblemInstance, routes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate costs of all routes and check if all products from the list can be bought on them in one pass.
+
+    :param instance: compiled problem instance
+    :param routes: padded array of routes
+    :return: array with costs of the routes and boolean array with feasibility of the routes
+    """
+
+    paths = np.pad(routes, ((0, 0), (1, 1)))
+    costs = instance.cost_matrix[paths[:, :-1], paths[:, 1:]].sum(axis=1) + instance.q[routes].sum(axis=1)
+    feasible = instance.stock[routes].any(axis=1).all(axis=1)
+    return costs, feasible
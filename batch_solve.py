@@ -0,0 +1,149 @@
+#!/usr/bin/python
+
+import json
+import os
+import sys
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator
+
+from bees_algorithm import add_bees_arguments, bees_algorithm
+from exact_solver import EXACT_MODES, solve_exact, use_exact
+from shop_network import ShopNetwork
+from worker_pool import call_shared, shared_pool
+
+
+def solve_request(network: ShopNetwork, request: Dict, seed: int, params: Dict, exact: str = 'auto') -> Dict:
+    """
+    Solve the problem of one customer.
+
+    :param network: network of shops
+    :param request: dictionary with start position and list of products (and optional id of the request)
+    :param seed: seed of the random numbers generator
+    :param params: keyword arguments of bees_algorithm()
+    :param exact: when the exact solver is used instead of the bees algorithm (see use_exact())
+    :return: dictionary with the solution, its cost, iteration in which it was found and number of iterations
+             (and lower bound of the cost and whether the solution is proven optimal for the exact solver)
+             or with the error message if the request cannot be solved
+    """
+
+    result = {'id': request['id']} if isinstance(request, dict) and 'id' in request else {}
+
+    try:
+        instance = network.instance(request['start'], request['list'], params.get('neighbours', 0))
+
+        exact_solution, optimal = None, False
+        if use_exact(instance, exact):
+            exact_solution, result['lower_bound'], optimal = solve_exact(instance)
+            result['optimal'] = optimal
+
+        # in the automatic mode the bees algorithm continues from the solution of the exact solver
+        # if branch and bound was stopped before proving that it is optimal
+        if exact_solution is not None and (optimal or exact == 'always'):
+            best_solution, best_iteration, iterations_num = exact_solution, 0, 0
+        else:
+            routes = [exact_solution.route] if exact_solution is not None else []
+            best_solution, best_iteration, iterations_num = bees_algorithm(
+                test_data=instance, seed=seed, routes=routes, **params)
+
+            if exact_solution is not None and exact_solution.cost < best_solution.cost:
+                best_solution, best_iteration = exact_solution, 0
+    except Exception as error:
+        # a malformed request becomes an error row, the batch continues with other requests
+        result['error'] = f'{type(error).__name__}: {error}'
+        return result
+
+    result.update(best_solution.to_dict(instance))
+    result['best_iteration'] = best_iteration
+    result['iterations'] = iterations_num
+    return result
+
+
+def solver_pool(network: ShopNetwork, workers: int = None) -> ProcessPoolExecutor:
+    """
+    :param network: network of shops, it is sent to each worker process once
+    :param workers: number of worker processes (None means number of processors)
+    :return: pool of worker processes solving requests submitted with solve_in_worker()
+    """
+
+    return shared_pool(network, workers)
+
+
+def solve_in_worker(request: Dict, seed: int, params: Dict, exact: str = 'auto') -> Dict:
+    """
+    Task of the pool created by solver_pool(), solve_request() with the network of the worker process.
+    """
+
+    return call_shared(solve_request, request, seed, params, exact)
+
+
+def solve_requests(network: ShopNetwork, requests: Iterable[Dict], workers: int = None, seed: int = 0,
+                   exact: str = 'auto', **params) -> Iterator[Dict]:
+    """
+    Solve problems of many customers in parallel processes. Requests are read lazily and only a bounded
+    number of them is solved at once, so both requests and results can be streamed.
+
+    :param network: network of shops, it is sent to each worker process once
+    :param requests: dictionaries with start positions and lists of products (and optional ids of requests)
+    :param workers: number of worker processes (None means number of processors)
+    :param seed: seed of the random numbers generators, i-th request uses seed + i
+    :param exact: when the exact solver is used instead of the bees algorithm (see use_exact())
+    :param params: keyword arguments of bees_algorithm()
+    :return: generator of results (see solve_request()) in order of requests
+    """
+
+    window = 4 * (workers or os.cpu_count() or 1)
+
+    with solver_pool(network, workers) as executor:
+        pending = deque()
+
+        for i, request in enumerate(requests):
+            pending.append(executor.submit(solve_in_worker, request, seed + i, params, exact))
+
+            if len(pending) >= window:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+def read_requests(file) -> Iterator[Dict]:
+    """
+    :param file: JSONL file with one request in each line
+    :return: generator of requests
+    """
+
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    add_bees_arguments(parser)
+    parser.add_argument('--time_limit', type=float, help='maximal time of the search for one request in seconds')
+    parser.add_argument('--exact', default='auto', choices=EXACT_MODES, help='when the exact solver is used instead of the bees algorithm: for small requests, always or never')
+    parser.add_argument('--workers', type=int, help='number of worker processes (default: number of processors)')
+    parser.add_argument('--seed', default=0, type=int, help='seed of the random numbers generators, i-th request uses seed + i')
+    parser.add_argument('--network', required=True, type=str, help='name of the JSON file with shops and weights (start and list are ignored)')
+    parser.add_argument('--requests', type=str, help='name of the JSONL file with requests {"start": {"x", "y"}, "list": [...], "id"} (default: standard input)')
+    parser.add_argument('--output', type=str, help='name of the JSONL file to save results (default: standard output)')
+    args = parser.parse_args()
+
+    shop_network = ShopNetwork.from_json(args.network)
+    bees_params = {
+        'ns': args.ns, 'ne': args.ne, 'nb': args.nb, 'nre': args.nre, 'nrb': args.nrb,
+        'neighbourhood_size': args.d, 'iters_without_improvement': args.improve_iters, 'max_iters': args.max_iters,
+        'temperature': args.temperature, 'temp_decay': args.decay, 'evaluation': args.evaluation,
+        'neighbours': args.neighbours, 'improve': args.improve, 'time_limit': args.time_limit
+    }
+
+    requests_file = open(args.requests, 'r') if args.requests else sys.stdin
+    output_file = open(args.output, 'w+') if args.output else sys.stdout
+
+    with requests_file, output_file:
+        for solved in solve_requests(shop_network, read_requests(requests_file), args.workers, args.seed,
+                                     args.exact, **bees_params):
+            output_file.write(json.dumps(solved) + '\n')
+            output_file.flush()
@@ -1,160 +1,673 @@
+import heapq
 import math
-import random
-from typing import Dict
+import os
+import time
+from argparse import ArgumentParser
+from contextlib import nullcontext
+from operator import attrgetter
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
 import json
+import numpy as np
 import basic_solutions_generator
+from batch_evaluation import clean_routes, evaluate_routes, pad_routes, unpad_routes
+from delta_evaluation import Route, RouteEvaluator
+from evaluation_cache import EvaluationCache
+from instrumentation import Instrumentation
+from problem_instance import ProblemInstance
+from random_streams import RandomStreams
+from solution import Solution
+from spatial_index import SpatialIndex
 
+COST = attrgetter('cost')
 
-def bees_algorithm(ns: int, ne: int, nb: int, nre: int, nrb: int, test_data: Dict, neighbourhood_size: float,
+# version of the format of checkpoint files
+CHECKPOINT_VERSION = 1
+
+
+class Progress(NamedTuple):
+    """
+    State of the search after an iteration.
+    """
+
+    iteration: int
+    best_cost: float
+    elapsed: float
+    evaluations: int
+
+
+def bees_algorithm(ns: int, ne: int, nb: int, nre: int, nrb: int, test_data: Union[Dict, ProblemInstance],
+                   neighbourhood_size: float,
                    iters_without_improvement: float = 150, max_iters: int = 500,
-                   temperature: float = 1000, temp_decay: float = 0.99):
+                   temperature: float = 1000, temp_decay: float = 0.99, *, evaluation: str = 'delta',
+                   neighbours: int = 0, cache: EvaluationCache = None, improve: int = 0,
+                   unique_patches: bool = False, time_limit: float = None,
+                   callback: Callable[[Progress], Optional[bool]] = None, stats: Instrumentation = None,
+                   seed: Union[int, np.random.SeedSequence] = None, routes: Iterable[Sequence[int]] = (),
+                   checkpoint: str = None, checkpoint_interval: int = 25):
     """
     :param ns: number of scouts
     :param ne: number of elite solutions
     :param nb: number of the best solutions
     :param nre: number of foragers for each elite solution
     :param nrb: number of foragers for each best, but not elite solution
-    :param test_data: dictionary with test data (start position, list, shops, weights)
+    :param test_data: dictionary with test data (start position, list, shops, weights) or compiled problem instance
     :param neighbourhood_size: Levenshtein distance in which we do local search
     :param iters_without_improvement: max number of iterations without improvement - stop condition
     :param max_iters: maximal number of iterations
     :param temperature: initial annealing temperature (temperature = 0 means no annealing)
     :param temp_decay: annealing temperature multiplier (how fast temperature should decay)
+    :param evaluation: 'delta' - every forager updates the cost of its route after each move,
+                       'batch' - routes of all foragers in the iteration are evaluated together with NumPy
+    :param neighbours: number of the nearest shops from which inserted, substituted and initially selected shops
+                       are drawn (0 means that they are drawn from all shops)
+    :param cache: cache of evaluated routes of foragers (None means no caching), its hit and miss counters
+                  can be read after the run; it pays off only with the batch evaluation, the delta evaluation
+                  costs routes of foragers by changes of the moves and looks up only accepted routes
+    :param improve: maximal number of 2-opt and Or-opt moves improving each route of scouts (0 means no improvement)
+    :param unique_patches: if True, patches are kept in an archive of solutions with distinct routes, so elite
+                           and best patches are not wasted on copies of the same route
+    :param time_limit: maximal time of the search in seconds (None means no limit), when it is exceeded
+                       the best solution found so far is returned
+    :param callback: function called with the progress after every iteration, the search is stopped
+                     if it returns False
+    :param stats: statistics of the run (timings of phases, evaluations, acceptance rates of moves), which are
+                  collected only if it is given
+    :param seed: seed of the random numbers generators (None means fresh entropy), every bee draws from its own
+                 stream derived from the seed, so the result depends only on the seed
+    :param routes: routes of known solutions (e.g. found for the previous version of the network) added to
+                   the initial population - warm start
+    :param checkpoint: name of the checkpoint file, the state of the search is saved to it every
+                       checkpoint_interval iterations and at the end, and if it exists, the search is continued
+                       from it (iterations are counted from the beginning of the saved search)
+    :param checkpoint_interval: number of iterations between checkpoints
+    :return: the best solution, iteration in which it was found and number of iterations
+    """
+
+    colony = BeesColony(ns, ne, nb, nre, nrb, ProblemInstance.of(test_data), neighbourhood_size,
+                        iters_without_improvement, temperature, temp_decay, evaluation=evaluation,
+                        neighbours=neighbours, cache=cache, improve=improve, unique_patches=unique_patches,
+                        stats=stats, seed=seed)
+    deadline = None if time_limit is None else time.time() + time_limit
+
+    if checkpoint is not None and os.path.exists(checkpoint):
+        colony.load_checkpoint(checkpoint)
+    else:
+        colony.initialize(routes)
+
+    # main loop
+    for progress in colony.run(max_iters, deadline):
+        if checkpoint is not None and progress.iteration % checkpoint_interval == 0:
+            colony.save_checkpoint(checkpoint)
+        if callback is not None and callback(progress) is False:
+            break
+
+    if checkpoint is not None:
+        colony.save_checkpoint(checkpoint)
+
+    return colony.result()
+
+
+def add_bees_arguments(parser: ArgumentParser) -> None:
+    """
+    Add command line arguments with parameters of the bees algorithm, shared by the scripts running it.
+
+    :param parser: parser of command line arguments
+    """
+
+    parser.add_argument('--ns', default=50, type=int, help='number of scouts')
+    parser.add_argument('--ne', default=20, type=int, help='number of elite solutions')
+    parser.add_argument('--nb', default=30, type=int, help='number of the best solutions')
+    parser.add_argument('--nre', default=5, type=int, help='number of foragers for each elite solution')
+    parser.add_argument('--nrb', default=3, type=int, help='number of foragers for each best, but not elite solution')
+    parser.add_argument('--d', default=6, type=int, help='Levenshtein distance in which we do local search')
+    parser.add_argument('--improve_iters', default=150, type=int, help='max number of iterations without improvement - stop condition')
+    parser.add_argument('--max_iters', default=500, type=int, help='maximal number of iterations')
+    parser.add_argument('--temperature', default=1000, type=float, help='initial annealing temperature (temperature = 0 means no annealing)')
+    parser.add_argument('--decay', default=0.99, type=float, help='annealing temperature multiplier (how fast temperature should decay)')
+    parser.add_argument('--evaluation', default='delta', choices=['delta', 'batch'], help='how foragers evaluate their routes: after every move or all together with NumPy')
+    parser.add_argument('--neighbours', default=0, type=int, help='number of the nearest shops from which new shops are drawn (0 means all shops)')
+    parser.add_argument('--improve', default=0, type=int, help='maximal number of 2-opt and Or-opt moves improving each route of scouts (0 means no improvement)')
+
+
+class BeesColony:
+    """
+    State of the bees algorithm (patches, the best solution, annealing temperature and stop condition counters),
+    so the search can be made iteration by iteration and continued later, also in another process.
     """
 
-    shops = {}
-    start = test_data['start']
-    weights = test_data['weights']
-    products_list = set(test_data['list'])
+    def __init__(self, ns: int, ne: int, nb: int, nre: int, nrb: int, instance: ProblemInstance,
+                 neighbourhood_size: float, iters_without_improvement: float = 150,
+                 temperature: float = 1000, temp_decay: float = 0.99, *, evaluation: str = 'delta',
+                 neighbours: int = 0, cache: EvaluationCache = None, improve: int = 0,
+                 unique_patches: bool = False, stats: Instrumentation = None,
+                 seed: Union[int, np.random.SeedSequence] = None):
+        """
+        Parameters have the same meaning as in bees_algorithm().
+        """
+
+        if evaluation not in ('delta', 'batch'):
+            raise ValueError(f'unknown evaluation mode: {evaluation}')
+
+        self.ns, self.ne, self.nb, self.nre, self.nrb = ns, ne, nb, nre, nrb
+        self.neighbourhood_size = neighbourhood_size
+        self.iters_without_improvement = iters_without_improvement
+        self.temperature = temperature
+        self.temp_decay = temp_decay
+        self.evaluation = evaluation
+        self.neighbours = neighbours
+        self.cache = cache
+        self.improve = improve
+        self.unique_patches = unique_patches
+        self.stats = stats
+        self.random = RandomStreams(seed)
+
+        # a forager draws at most a few numbers for every move and for every product bought in repairs
+        self.block = 8 * math.ceil(neighbourhood_size) + 8
+
+        self.patches = []
+        self.best_solution = None
+        self.best_iteration = 0
+        self.no_improvement = 0
+        self.iterations_num = 0
+        self.evaluations = 0
+        self.stopped = False
+
+        self.attach(instance)
+
+    def __getstate__(self) -> Dict:
+        # problem instance is not sent between processes together with the colony
+        state = self.__dict__.copy()
+        state['instance'] = None
+        state['generator'] = None
+        return state
+
+    def attach(self, instance: ProblemInstance) -> None:
+        """
+        Set the problem instance (also after the colony has been sent to another process) and create
+        the generator of scouts' solutions, which is then reused in every iteration.
+
+        :param instance: compiled problem instance
+        """
+
+        self.instance = instance
+        self.generator = basic_solutions_generator.SolutionGenerator(instance, self.neighbours, self.improve)
+
+    @property
+    def spatial_index(self) -> SpatialIndex:
+        return self.instance.spatial_index(self.neighbours)
+
+    def phase(self, name: str):
+        # time of the phase is measured only if statistics are collected
+        return self.stats.phase(name) if self.stats is not None else nullcontext()
+
+    def initialize(self, routes: Iterable[Sequence[int]] = ()) -> None:
+        """
+        Create initial population.
+
+        :param routes: routes of known solutions added to the population instead of some scouts (warm start),
+                       they are made valid for the problem instance (see validate())
+        """
+
+        solutions = [self.validate(route, prune=True) for route in routes]
+        scouts = max(self.ns - len(solutions), 0)
+        solutions += self.generator.generate(scouts, self.random.streams([self.generator.block] * scouts))
+
+        self.patches = select_patches(solutions, self.nb, self.unique_patches)
+        self.best_solution = self.patches[0]
+        self.evaluations = len(solutions)
+
+    def validate(self, route: Sequence[int], prune: bool = False) -> Solution:
+        """
+        Make the route of a solution saved earlier, possibly for a slightly different network, valid for
+        the problem instance: shops which do not exist or repeat are skipped, products which cannot be bought
+        are bought in added shops and the cost is calculated again.
+
+        :param route: identifiers of visited shops
+        :param prune: if True, all shops which do not add anything are removed, otherwise only added shops
+        :return: valid solution
+        """
+
+        shops = list(dict.fromkeys(shop for shop in route if 1 <= shop <= self.instance.n_shops))
+        path = RouteEvaluator(self.instance, shops)
+        added = []
 
-    for shop in test_data['shops']:
-        shops[shop['id']] = shop
+        # random numbers are drawn only if the route has to be repaired, so restoring a checkpoint
+        # of the same instance does not change the streams of the colony
+        if not path.feasible:
+            self.repair(path, added, self.random.streams([self.block])[0])
+        path.prune(path.route if prune else added)
 
-    def solve():
+        return Solution(path.route, self.instance.route_cost(path.route))
+
+    def to_dict(self) -> Dict:
+        """
+        :return: state of the search (patches, the best solution, annealing temperature, stop condition
+                 counters and state of random numbers), from which it can be continued
+        """
+
+        return {
+            'version': CHECKPOINT_VERSION,
+            'iterations_num': self.iterations_num,
+            'best_iteration': self.best_iteration,
+            'no_improvement': self.no_improvement,
+            'evaluations': self.evaluations,
+            'temperature': self.temperature,
+            'best_solution': {'route': self.best_solution.route.tolist(), 'cost': self.best_solution.cost},
+            'patches': [{'route': patch.route.tolist(), 'cost': patch.cost} for patch in self.patches],
+            'random': self.random.to_dict()
+        }
+
+    def restore(self, state: Dict) -> None:
+        """
+        Continue the search from the saved state. Parameters of the colony are not saved, so the search
+        can be continued with a different number of iterations or stop condition.
+
+        :param state: dictionary created by to_dict()
+        """
+
+        if state.get('version') != CHECKPOINT_VERSION:
+            raise ValueError(f'unsupported version of the checkpoint: {state.get("version")}')
+
+        self.random = RandomStreams.from_dict(state['random'])
+        self.iterations_num = state['iterations_num']
+        self.best_iteration = state['best_iteration']
+        self.no_improvement = state['no_improvement']
+        self.evaluations = state['evaluations']
+        self.temperature = state['temperature']
+        self.stopped = self.no_improvement >= self.iters_without_improvement
+
+        self.patches = [self.validate(patch['route']) for patch in state['patches']]
+        self.best_solution = min([self.validate(state['best_solution']['route'])] + self.patches, key=COST)
+
+    def save_checkpoint(self, filename: str) -> None:
         """
-        main function which create initial population and do bees algorithm
+        Save the state of the search to the JSON file. The file is replaced at once, so it is not damaged
+        if the process is killed while saving.
+
+        :param filename: name of the checkpoint file
         """
-        nonlocal temperature
 
-        initial_population = basic_solutions_generator.generate(test_data, ns)
-        initial_population.sort(key=lambda x: x.get('cost'))
-        patches = initial_population[:nb]
+        with open(filename + '.tmp', 'w+') as file:
+            json.dump(self.to_dict(), file)
 
-        best_cost = patches[0]['cost']
-        best_solution = patches[0]
-        best_iteration = 0
+        os.replace(filename + '.tmp', filename)
 
-        no_improvement = 0
-        iterations_num = 0
+    def load_checkpoint(self, filename: str) -> None:
+        """
+        :param filename: name of the checkpoint file saved by save_checkpoint()
+        """
 
-        # main loop
-        for i in range(max_iters):
-            new_solutions = []
-            # search in elite and best solutions
-            for j in range(ne):
-                new_solution = local_search(patches[j], nre, temperature)
-                new_solutions.append(new_solution)
-            for j in range(ne, nb):
-                new_solution = local_search(patches[j], nrb, temperature)
-                new_solutions.append(new_solution)
+        with open(filename, 'r') as file:
+            self.restore(json.load(file))
 
-            # other bees are doing global search
-            global_searches = basic_solutions_generator.generate(test_data, ns - nb)
-            # after getting new solutions we sort them and check best
-            new_solutions.extend(global_searches)
-            new_solutions.sort(key=lambda x: x.get('cost'))
-            new_best_cost = new_solutions[0]
+    def run(self, max_iters: int, deadline: float = None) -> Iterator[Progress]:
+        """
+        Make iterations until the stop condition is met, the number of iterations reaches max_iters or
+        the deadline passes, yielding the progress after every iteration. The caller can stop iterating
+        at any time and take the best solution found so far from result().
 
-            # we check stop conditions
-            if new_best_cost['cost'] >= best_cost:
-                no_improvement += 1
+        :param max_iters: maximal number of iterations (counted from the beginning of the search)
+        :param deadline: time (as returned by time.time()) after which no new iteration is started
+        :return: generator of the progress of the search
+        """
+
+        start = time.time()
+
+        while (not self.stopped and self.iterations_num < max_iters and (deadline is None or time.time() < deadline)
+               and self.step()):
+            yield Progress(self.iterations_num, self.best_solution.cost, time.time() - start, self.evaluations)
+
+    def step(self) -> bool:
+        """
+        Make one iteration of the bees algorithm.
+
+        :return: False if the stop condition has been met, True otherwise
+        """
+
+        i = self.iterations_num
+        new_solutions = []
+        # random numbers of all bees of the iteration are drawn at once, foragers of each patch
+        # and scouts take their own streams and every patch gets one number for the annealing
+        counts = [self.nre if j < self.ne else self.nrb for j in range(len(self.patches))]
+        scouts = self.ns - self.nb
+        streams = self.random.streams([self.block] * sum(counts) + [self.generator.block] * scouts)
+        acceptance = self.random.random(len(self.patches))
+        # search in elite and best solutions
+        with self.phase('local_search'):
+            if self.evaluation == 'batch':
+                new_solutions.extend(self.batch_local_search(self.patches, streams, acceptance))
             else:
-                no_improvement = 0
-                best_cost = new_best_cost['cost']
-                best_solution = new_best_cost.copy()
-                best_iteration = i
+                first = 0
+                for j, patch in enumerate(self.patches):
+                    new_solution = self.local_search(patch, counts[j], streams[first:first + counts[j]],
+                                                     acceptance[j])
+                    new_solutions.append(new_solution)
+                    first += counts[j]
 
-            if no_improvement >= iters_without_improvement:
-                break
+        # other bees are doing global search
+        with self.phase('scouting'):
+            global_searches = self.generator.generate(scouts, streams[len(streams) - scouts:])
+        foragers = sum(counts)
+        self.evaluations += foragers + len(global_searches)
+        if self.stats is not None:
+            self.stats.count('forager_evaluations', foragers)
+            self.stats.count('scout_evaluations', len(global_searches))
+        # after getting new solutions we select the best ones and check the best
+        new_solutions.extend(global_searches)
+        with self.phase('selection'):
+            new_solutions = select_patches(new_solutions, self.nb, self.unique_patches)
+        new_best_cost = new_solutions[0]
+
+        # we check stop conditions
+        if new_best_cost.cost >= self.best_solution.cost:
+            self.no_improvement += 1
+        else:
+            self.no_improvement = 0
+            self.best_solution = new_best_cost
+            self.best_iteration = i
+
+        if self.no_improvement >= self.iters_without_improvement:
+            self.stopped = True
+            return False
+
+        # new patches are our new solutions
+        self.patches = new_solutions
+        self.temperature *= self.temp_decay
+        self.iterations_num += 1
+        return True
+
+    def immigrate(self, solutions: List[Solution]) -> None:
+        """
+        Replace the worst patches with better solutions found by other colonies.
+
+        :param solutions: solutions found by other colonies
+        """
+
+        routes = {patch.key for patch in self.patches}
+        solutions = [s for s in solutions if s.key not in routes]
+
+        self.patches = select_patches(self.patches + solutions, self.nb, self.unique_patches)
+
+        if self.patches[0].cost < self.best_solution.cost:
+            self.best_solution = self.patches[0]
+            self.best_iteration = self.iterations_num
 
-            # new patches are our new solutions
-            patches = new_solutions[:nb]
-            temperature *= temp_decay
-            iterations_num += 1
+    def result(self) -> Tuple[Solution, int, int]:
+        """
+        :return: the best solution, iteration in which it was found and number of iterations
+        """
 
-        return best_solution, best_iteration, iterations_num
+        return self.best_solution, self.best_iteration, self.iterations_num
 
-    def local_search(scout, foragers, temperature):
+    def local_search(self, scout, foragers, streams=None, acceptance=None):
         # local search in the neighbourhood of scout - every forager create his own solution
-        original_path = []
+        # with its own stream of random numbers (drawn from the colony if not given)
+        if streams is None:
+            streams = self.random.streams([self.block] * foragers)
+            acceptance = self.random.random(1)[0]
+        original_path = RouteEvaluator(self.instance, scout.route, scout.cost)
+        moves = [[] if self.stats is not None else None for _ in range(foragers)]
         solutions = []
-        for elem in scout['solution']:
-            original_path.append(elem[0])
         for i in range(foragers):
-            solutions.append(generate_new_solution(original_path))
-        solution = min(solutions, key=lambda x: x.get('cost'))
+            solutions.append(self.generate_new_solution(original_path, streams[i], moves[i]))
+        best = min(range(foragers), key=lambda i: solutions[i].cost)
+        accepted = self.accept(scout.cost, solutions[best].cost, acceptance)
 
-        cost_difference = scout['cost'] - solution['cost']
-        if cost_difference > 0 or (temperature > 0 and random.random() < math.exp(cost_difference / temperature)):
-            return solution
+        if self.stats is not None:
+            for i in range(foragers):
+                self.stats.record_moves(moves[i], accepted and i == best)
+
+        if accepted:
+            return self.evaluate(solutions[best])
         else:
             return scout
 
-    def generate_new_solution(original_path):
-        #generating new solution
+    def evaluate(self, path):
+        # accepted route is costed from scratch once, so rounding errors of the deltas do not accumulate,
+        # routes found again by foragers of later iterations are taken from the cache
+        key = tuple(path.route)
+        cost = self.cache.get(key) if self.cache is not None else None
+        if cost is None:
+            with self.phase('evaluation'):
+                cost = self.instance.route_cost(path.route)
+            if self.cache is not None:
+                self.cache.put(key, cost)
+        return Solution(path.route, cost)
+
+    def evaluate_batch(self, paths):
+        # routes are cleaned and evaluated together, except routes found earlier which are taken from the cache
+        instance = self.instance
+        keys = [tuple(path) for path in paths]
+        results = [self.cache.get(key) for key in keys] if self.cache is not None else [None] * len(keys)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            with self.phase('evaluation'):
+                cleaned = clean_routes(instance, pad_routes([keys[i] for i in missing]))
+                costs, _ = evaluate_routes(instance, cleaned)
+            for i, route, cost in zip(missing, unpad_routes(cleaned), costs.tolist()):
+                results[i] = (route, cost)
+                if self.cache is not None:
+                    self.cache.put(keys[i], results[i])
+        routes, costs = zip(*results)
+        return list(routes), np.array(costs)
+
+    def batch_local_search(self, patches, streams, acceptance):
+        # local search in the neighbourhoods of all patches - routes of all foragers are evaluated at once
+        instance = self.instance
+        foragers = [self.nre if j < self.ne else self.nrb for j in range(len(patches))]
+        original_paths = [Route(instance, patch.route) for patch in patches]
+        owners = np.repeat(np.arange(len(patches)), foragers)
+
+        moves = [[] if self.stats is not None else None for _ in owners]
+        new_paths = [self.random_neighbour(original_paths[owner], streams[i], moves[i])[0].route
+                     for i, owner in enumerate(owners)]
+        routes, costs = self.evaluate_batch(new_paths)
+
+        solutions = []
+        first = 0
+        for j, (patch, n) in enumerate(zip(patches, foragers)):
+            k = first + int(np.argmin(costs[first:first + n]))
+            accepted = self.accept(patch.cost, costs[k], acceptance[j])
+
+            if self.stats is not None:
+                for i in range(first, first + n):
+                    self.stats.record_moves(moves[i], accepted and i == k)
+            first += n
+
+            if accepted:
+                solutions.append(Solution(routes[k], float(costs[k])))
+            else:
+                solutions.append(patch)
+
+        return solutions
+
+    def accept(self, scout_cost, cost, uniform):
+        # better solutions are always accepted, worse ones with the annealing probability
+        # (uniform is the random number of the patch from [0, 1))
+        cost_difference = scout_cost - cost
+        temperature = self.temperature
+        accepted = cost_difference > 0 or (
+            temperature > 0 and uniform < math.exp(cost_difference / temperature))
+        if self.stats is not None:
+            self.stats.record_acceptance(cost_difference > 0, accepted)
+        return accepted
+
+    def random_neighbour(self, original_path, stream, moves=None):
         # 0 - add shop, 1 - remove shop, 2 - substitute shop, 3 - permutation
-        while True:
-            new_path = original_path.copy()
-            distance = neighbourhood_size
-            while distance > 0:
-                operation = random.randint(0, 3)
-                if operation == 0:
-                    position = random.randint(1, len(shops))
-                    if position not in new_path:
-                        index = random.randint(0, len(new_path))
-                        new_path.insert(index, position)
-                        distance -= 1
-                elif operation == 1:
-                    elem_to_remove = random.sample(new_path, 1)
-                    if elem_to_remove in new_path:
-                        new_path.remove(elem_to_remove)
-                        distance -= 1
-                elif operation == 2:
-                    position = random.randint(1, len(shops))
-                    if position not in new_path:
-                        index = random.randrange(0, len(new_path))
-                        new_path[index] = position
-                        distance -= 1
-                else:
-                    if distance >= 2:
-                        positions_list = [i for i in range(len(new_path))]
-                        positions = random.sample(positions_list, 2)
-                        new_path[positions[0]], new_path[positions[1]] = new_path[positions[1]], new_path[positions[0]]
-                        distance -= 2
-            solution = check_solution(new_path, shops, products_list)
-            if solution is not None:
-                listed_solution = []
-                for elem in solution.items():
-                    listed_solution.append((elem[0], list(elem[1])))
-                cost = basic_solutions_generator.calculate_cost(listed_solution, shops, start, weights)
-                return {'solution': listed_solution, 'cost': cost}
-
-    return solve()
-
-
-def check_solution(path, shops, products_list):
+        # only valid moves are drawn and products missing after a move are bought in added shops,
+        # so the neighbour is always feasible and is found in bounded time,
+        # drawn operations are appended to moves if it is given
+        n_shops = self.instance.n_shops
+        new_path = original_path.copy()
+        added = []
+        distance = self.neighbourhood_size
+        while distance > 0:
+            operations = []
+            if len(new_path) < n_shops:
+                operations.append(0)
+            if len(new_path) > 0:
+                operations.append(1)
+                if len(new_path) < n_shops:
+                    operations.append(2)
+            if distance >= 2 and len(new_path) >= 2:
+                operations.append(3)
+
+            operation = stream.choice(operations)
+            if moves is not None:
+                moves.append(operation)
+            if operation == 0:
+                index = stream.randint(0, len(new_path))
+                position = self.random_insert(new_path, index, stream)
+                new_path.insert(index, position)
+                added.append(position)
+                distance -= 1
+            elif operation == 1:
+                new_path.remove(stream.randrange(len(new_path)))
+                distance -= 1
+            elif operation == 2:
+                index = stream.randrange(len(new_path))
+                position = self.random_substitute(new_path, new_path.route[index], stream)
+                new_path.substitute(index, position)
+                added.append(position)
+                distance -= 1
+            else:
+                positions = stream.pair(len(new_path))
+                new_path.swap(positions[0], positions[1])
+                distance -= 2
+            self.repair(new_path, added, stream)
+        return new_path, added
+
+    def random_shop_outside(self, path, stream):
+        # r-th shop (in order of identifiers) which is not on the path
+        shop = stream.randrange(self.instance.n_shops - len(path)) + 1
+        for shop_on_path in sorted(path.route):
+            if shop_on_path > shop:
+                break
+            shop += 1
+        return shop
+
+    def random_insert(self, path, index, stream):
+        # shop inserted at given index, in the neighbourhood mode one of the shops nearest to the previous node
+        if self.neighbours > 0:
+            previous = path.route[index - 1] if index > 0 else 0
+            candidates = [shop for shop in self.spatial_index.nearest(previous).tolist() if shop not in path]
+            if candidates:
+                return stream.choice(candidates)
+            if self.stats is not None:
+                self.stats.count('fallbacks')
+        return self.random_shop_outside(path, stream)
+
+    def random_substitute(self, path, old_shop, stream):
+        # shop that has in stock a product which can be bought only in the substituted shop,
+        # in the neighbourhood mode one of such shops nearest to the substituted shop
+        sole_items = path.sole_items(old_shop)
+        if sole_items:
+            k = stream.choice(sole_items)
+            if self.neighbours > 0:
+                shops = self.spatial_index.nearest_stocking(old_shop, k, self.neighbours + 1).tolist()
+            else:
+                shops = self.instance.index_shops[k]
+            candidates = [shop for shop in shops if shop not in path]
+            if candidates:
+                return stream.choice(candidates)
+        elif self.neighbours > 0:
+            candidates = [shop for shop in self.spatial_index.nearest(old_shop).tolist() if shop not in path]
+            if candidates:
+                return stream.choice(candidates)
+        if self.stats is not None and (sole_items or self.neighbours > 0):
+            self.stats.count('fallbacks')
+        return self.random_shop_outside(path, stream)
+
+    def repair(self, path, added, stream):
+        # buy missing products in random shops that have them in stock,
+        # in the neighbourhood mode in one of such shops nearest to the previous node
+        while not path.feasible:
+            k = stream.choice(sorted(path.missing_items))
+            index = stream.randint(0, len(path))
+            if self.neighbours > 0:
+                previous = path.route[index - 1] if index > 0 else 0
+                shop = stream.choice(self.spatial_index.nearest_stocking(previous, k, self.neighbours).tolist())
+            else:
+                shop = stream.choice(self.instance.index_shops[k])
+            path.insert(index, shop)
+            added.append(shop)
+            if self.stats is not None:
+                self.stats.count('repairs')
+
+    def generate_new_solution(self, original_path, stream, moves=None):
+        #generating new solution - cost and coverage are updated after every move by the route evaluator
+        new_path, added = self.random_neighbour(original_path, stream, moves)
+        # shops which do not add anything are skipped as in check_solution()
+        new_path.prune(added)
+        return new_path
+
+
+def select_patches(solutions: List[Solution], n: int, unique: bool = False) -> List[Solution]:
+    """
+    Select n solutions with the lowest costs (in the same order as sorting by cost would give) without
+    sorting all solutions.
+
+    :param solutions: list of solutions
+    :param n: number of selected solutions
+    :param unique: if True, solutions with routes equal to routes of better solutions are selected only
+                   when there are not enough solutions with distinct routes
+    :return: sorted list of the best solutions
+    """
+
+    if not unique:
+        return heapq.nsmallest(n, solutions, key=COST)
+
+    # solutions are taken from the heap in order of costs until n distinct routes are found
+    heap = [(solution.cost, i) for i, solution in enumerate(solutions)]
+    heapq.heapify(heap)
+    selected, duplicates, routes = [], [], set()
+
+    while heap and len(selected) < n:
+        solution = solutions[heapq.heappop(heap)[1]]
+        if solution.key in routes:
+            duplicates.append(solution)
+        else:
+            routes.add(solution.key)
+            selected.append(solution)
+
+    if len(selected) < n:
+        selected = sorted(selected + duplicates[:n - len(selected)], key=COST)
+
+    return selected
+
+
+def check_solution(path, shops, products_list=None):
     #checking the solution as in as in basic_solve.select_shops()
+    #shops can be a dictionary with all available shops or compiled problem instance
+    if isinstance(shops, ProblemInstance):
+        return check_solution_mask(path, shops, products_list)
     result = {}
     for shop_number in path:
-        current_shop = shops[shop_number]
-        if len(products_list & current_shop['items']) != 0:
-            result[shop_number] = products_list & current_shop['items']
-            products_list = products_list - current_shop['items']
+        current_items = set(shops[shop_number]['items'])
+        if len(products_list & current_items) != 0:
+            result[shop_number] = products_list & current_items
+            products_list = products_list - current_items
     if len(products_list) == 0:
         return result
     return None
 
 
+def check_solution_mask(path, instance, products_list=None):
+    #the same check with bitsets of products - every test is a single bitwise operation
+    products_mask = instance.full_mask
+    if products_list is not None:
+        products_mask = sum(1 << k for k, item in enumerate(instance.item_list) if item in products_list)
+    result = {}
+    for shop_number in path:
+        bought = products_mask & instance.shop_masks[shop_number]
+        if bought:
+            result[shop_number] = set(instance.items_of(bought))
+            products_mask ^= bought
+    if products_mask == 0:
+        return result
+    return None
+
+
 if __name__ == '__main__':
     with open('tests/data/normal2d.json', 'r') as file:
         print(bees_algorithm(7, 2, 5, 3, 2, json.load(file), 3))
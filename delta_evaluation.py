@@ -0,0 +1,207 @@
+from typing import Iterable, List, Tuple
+
+from problem_instance import ProblemInstance
+
+
+class Route:
+    """
+    Ordered list of shops with constant time membership test and incrementally maintained product coverage,
+    on which forager moves are made.
+    """
+
+    def __init__(self, instance: ProblemInstance, route: Iterable[int] = ()):
+        """
+        :param instance: compiled problem instance
+        :param route: ordered identifiers of visited shops
+        """
+
+        self.instance = instance
+        self.route = list(route)
+        self._on_route = set(self.route)
+
+        # counts[k] - number of shops on the route that have in stock k-th product from the list
+        self.counts = instance.stock[self.route].sum(axis=0).tolist()
+        self.missing_items = {k for k, count in enumerate(self.counts) if count == 0}
+
+    def copy(self) -> 'Route':
+        new = self.__class__.__new__(self.__class__)
+        new.instance = self.instance
+        new.route = self.route.copy()
+        new._on_route = self._on_route.copy()
+        new.counts = self.counts.copy()
+        new.missing_items = self.missing_items.copy()
+        return new
+
+    def __contains__(self, shop: int) -> bool:
+        return shop in self._on_route
+
+    def __len__(self) -> int:
+        return len(self.route)
+
+    @property
+    def feasible(self) -> bool:
+        """
+        True if all products from the list can be bought on the route.
+        """
+
+        return not self.missing_items
+
+    def _add_items(self, shop: int) -> None:
+        counts = self.counts
+        for k in self.instance.shop_item_indices[shop]:
+            if counts[k] == 0:
+                self.missing_items.discard(k)
+            counts[k] += 1
+
+    def _remove_items(self, shop: int) -> None:
+        counts = self.counts
+        for k in self.instance.shop_item_indices[shop]:
+            counts[k] -= 1
+            if counts[k] == 0:
+                self.missing_items.add(k)
+
+    def insert(self, index: int, shop: int) -> None:
+        self.route.insert(index, shop)
+        self._on_route.add(shop)
+        self._add_items(shop)
+
+    def remove(self, index: int) -> None:
+        shop = self.route.pop(index)
+        self._on_route.discard(shop)
+        self._remove_items(shop)
+
+    def substitute(self, index: int, shop: int) -> None:
+        old = self.route[index]
+        self.route[index] = shop
+        self._on_route.discard(old)
+        self._on_route.add(shop)
+        self._remove_items(old)
+        self._add_items(shop)
+
+    def swap(self, i: int, j: int) -> None:
+        self.route[i], self.route[j] = self.route[j], self.route[i]
+
+    def sole_items(self, shop: int) -> List[int]:
+        """
+        Products (column indices of the stock matrix) that can be bought only in given shop on the route.
+        """
+
+        counts = self.counts
+        return [k for k in self.instance.shop_item_indices[shop] if counts[k] == 1]
+
+    def is_redundant(self, shop: int) -> bool:
+        """
+        True if all products available in the shop can also be bought in other shops on the route.
+        """
+
+        counts = self.counts
+        return all(counts[k] > 1 for k in self.instance.shop_item_indices[shop])
+
+
+class RouteEvaluator(Route):
+    """
+    Route with incrementally maintained cost. Every move (insert, remove, substitute, swap) changes at most
+    four edges of the route, so its cost difference is calculated in constant time instead of recalculating
+    the whole route with calculate_cost.
+    """
+
+    def __init__(self, instance: ProblemInstance, route: Iterable[int] = (), cost: float = None):
+        """
+        :param instance: compiled problem instance
+        :param route: ordered identifiers of visited shops
+        :param cost: cost of the route if it is already known
+        """
+
+        super().__init__(instance, route)
+        self.cost = instance.route_cost(self.route) if cost is None else cost
+
+    def copy(self) -> 'RouteEvaluator':
+        new = super().copy()
+        new.cost = self.cost
+        return new
+
+    def _neighbours(self, index: int, removed: bool = True) -> Tuple[int, int]:
+        # nodes before and after given position (0 is the start point); if removed is False,
+        # the neighbours are the nodes between which a new shop would be inserted
+        route = self.route
+        before = route[index - 1] if index > 0 else 0
+        after_index = index + 1 if removed else index
+        after = route[after_index] if after_index < len(route) else 0
+        return before, after
+
+    def insert_delta(self, index: int, shop: int) -> float:
+        c = self.instance.cost_matrix
+        a, b = self._neighbours(index, removed=False)
+        return c[a, shop] + c[shop, b] - c[a, b] + self.instance.q[shop]
+
+    def remove_delta(self, index: int) -> float:
+        c = self.instance.cost_matrix
+        a, b = self._neighbours(index)
+        shop = self.route[index]
+        return c[a, b] - c[a, shop] - c[shop, b] - self.instance.q[shop]
+
+    def substitute_delta(self, index: int, shop: int) -> float:
+        c, q = self.instance.cost_matrix, self.instance.q
+        a, b = self._neighbours(index)
+        old = self.route[index]
+        return c[a, shop] + c[shop, b] - c[a, old] - c[old, b] + q[shop] - q[old]
+
+    def swap_delta(self, i: int, j: int) -> float:
+        if i == j:
+            return 0.
+        if i > j:
+            i, j = j, i
+
+        c = self.instance.cost_matrix
+        route = self.route
+        x, y = route[i], route[j]
+        a, _ = self._neighbours(i)
+        _, b = self._neighbours(j)
+
+        if j == i + 1:
+            return c[a, y] + c[y, x] + c[x, b] - c[a, x] - c[x, y] - c[y, b]
+
+        x_next, y_prev = route[i + 1], route[j - 1]
+        return (c[a, y] + c[y, x_next] + c[y_prev, x] + c[x, b]
+                - c[a, x] - c[x, x_next] - c[y_prev, y] - c[y, b])
+
+    def insert(self, index: int, shop: int) -> None:
+        self.cost += self.insert_delta(index, shop)
+        super().insert(index, shop)
+
+    def remove(self, index: int) -> None:
+        self.cost += self.remove_delta(index)
+        super().remove(index)
+
+    def substitute(self, index: int, shop: int) -> None:
+        self.cost += self.substitute_delta(index, shop)
+        super().substitute(index, shop)
+
+    def swap(self, i: int, j: int) -> None:
+        self.cost += self.swap_delta(i, j)
+        super().swap(i, j)
+
+    def prune(self, added: Iterable[int]) -> None:
+        """
+        Remove shops that do not add anything to the coverage after new shops have been added to the route.
+        Only the added shops and shops sharing products with them can become redundant, so the rest
+        of the route is not checked. The removal that saves the most is applied first.
+
+        :param added: identifiers of shops added to the route
+        """
+
+        candidates = set()
+        for shop in added:
+            if shop in self._on_route:
+                candidates.add(shop)
+                for k in self.instance.shop_item_indices[shop]:
+                    candidates.update(s for s in self.instance.index_shops[k] if s in self._on_route)
+
+        while candidates:
+            redundant = [self.route.index(shop) for shop in candidates if self.is_redundant(shop)]
+            if not redundant:
+                break
+
+            index = min(redundant, key=self.remove_delta)
+            candidates.discard(self.route[index])
+            self.remove(index)
@@ -0,0 +1,61 @@
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class EvaluationCache:
+    """
+    Results of route evaluations keyed by the route (tuple of shop identifiers), with a bounded size.
+    When the cache is full, the least recently used result is evicted.
+    """
+
+    def __init__(self, maxsize: int = 100000):
+        """
+        :param maxsize: maximal number of stored results
+        """
+
+        if maxsize <= 0:
+            raise ValueError('size of the evaluation cache has to be positive')
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def get(self, route: Hashable) -> Any:
+        """
+        :param route: tuple of shop identifiers
+        :return: stored result of the evaluation of the route or None if it has not been evaluated
+        """
+
+        result = self._results.get(route)
+
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._results.move_to_end(route)
+
+        return result
+
+    def put(self, route: Hashable, result: Any) -> None:
+        """
+        :param route: tuple of shop identifiers
+        :param result: result of the evaluation of the route
+        """
+
+        self._results[route] = result
+        self._results.move_to_end(route)
+
+        if len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.
+
+    def __str__(self) -> str:
+        return f'{self.hits} hits, {self.misses} misses ({self.hit_rate:.1%} hit rate), {len(self)} stored routes'
@@ -0,0 +1,244 @@
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from problem_instance import ProblemInstance
+from solution import Solution
+
+# the exact solver is selected automatically for instances with at most this number of states of dynamic
+# programming and at most this number of shops (the cheapest ways between all shops are calculated)
+EXACT_LIMIT = 2 ** 20
+EXACT_SHOPS_LIMIT = 500
+
+# maximal number of partial routes checked by branch and bound, after which the best route found is returned
+# without the proof of optimality
+MAX_NODES = 10 ** 5
+
+EXACT_MODES = ['auto', 'always', 'never']
+
+# branches which cannot be better than the best route by more than this are cut off
+EPSILON = 1e-9
+
+
+def _relevant_shops(instance: ProblemInstance) -> List[int]:
+    # shops without any product from the list can be visited only on the way to other shops
+    return [shop for shop in range(1, instance.n_shops + 1) if instance.shop_masks[shop]]
+
+
+def _direct_costs(instance: ProblemInstance) -> np.ndarray:
+    # costs of going directly between all nodes, including queue costs of target shops
+    nodes = np.arange(instance.n_shops + 1)
+    return np.asarray(instance.cost_matrix[nodes[:, np.newaxis], nodes], dtype=np.float64) + instance.q
+
+
+def exact_states(instance: ProblemInstance) -> int:
+    """
+    :param instance: compiled problem instance
+    :return: number of states of the exact solver (sets of bought products times the start point and shops
+             with any product from the list)
+    """
+
+    return (1 << len(instance.item_list)) * (len(_relevant_shops(instance)) + 1)
+
+
+def use_exact(instance: ProblemInstance, mode: str = 'auto') -> bool:
+    """
+    :param instance: compiled problem instance
+    :param mode: 'auto' - the exact solver is used for instances with at most EXACT_LIMIT states,
+                 at most EXACT_SHOPS_LIMIT shops and without negative costs of going to shops
+                 (cycles with negative cost make the lower bounds invalid), 'always' - the exact solver
+                 is always used, 'never' - the exact solver is never used
+    :return: True if the instance should be solved with solve_exact()
+    """
+
+    if mode not in EXACT_MODES:
+        raise ValueError(f'unknown exact solver mode: {mode}')
+
+    if mode != 'auto':
+        return mode == 'always'
+
+    return (instance.n_shops <= EXACT_SHOPS_LIMIT and exact_states(instance) <= EXACT_LIMIT
+            and _direct_costs(instance).min() >= 0)
+
+
+def cheapest_ways(instance: ProblemInstance) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Floyd-Warshall algorithm over all shops. Weights do not have to satisfy the triangle inequality,
+    so going through other shops (and paying their queue costs) may be cheaper than going directly.
+
+    :param instance: compiled problem instance
+    :return: costs[i, j] - the lowest cost of going from i to j through any shops (but not the start point),
+             including queue costs of the shops on the way and of j, and next_nodes[i, j] - the first node
+             after i on this way
+    """
+
+    costs = _direct_costs(instance)
+    size = len(costs)
+    next_nodes = np.tile(np.arange(size), (size, 1))
+
+    for k in range(1, size):
+        through = costs[:, k, np.newaxis] + costs[k]
+        shorter = through < costs
+        costs = np.where(shorter, through, costs)
+        next_nodes = np.where(shorter, next_nodes[:, k, np.newaxis], next_nodes)
+
+    if (costs.diagonal()[1:] < 0).any():
+        raise ValueError('weights contain a cycle with negative cost')
+
+    return costs, next_nodes
+
+
+class ExactSolver:
+    """
+    Exact solver for small instances. Each shop in which something is bought adds a product which earlier
+    shops do not have, so the cheapest way of buying the remaining products depends only on the set of bought
+    products and the current shop. These costs are calculated by dynamic programming in the style
+    of Held-Karp, but over sets of bought products instead of sets of visited shops, with shops in which
+    products are bought connected by the cheapest ways through other shops. Repeated visits are not excluded,
+    so the cost from the start point is the lower bound of the cost of solutions, and the costs from other
+    states are lower bounds of branch and bound over routes, which finds the optimal route if the route
+    of the dynamic programming goes through some shop twice.
+    Time and memory grow with 2^(number of products) times the number of shops which have any of them
+    and with the cube of the number of all shops. The cost is the same as calculate_cost() (weights may be
+    asymmetric, queue costs are included).
+    """
+
+    def __init__(self, test_data: Union[Dict, ProblemInstance]):
+        """
+        :param test_data: dictionary with test data (start position, list, shops, weights) or compiled problem instance
+        """
+
+        self.instance = instance = ProblemInstance.of(test_data)
+        self.nodes = np.array([0] + _relevant_shops(instance), dtype=np.int64)
+        self.masks = np.array([instance.shop_masks[node] for node in self.nodes.tolist()], dtype=np.int64)
+        self.masks[0] = 0
+
+        if int(np.bitwise_or.reduce(self.masks)) != instance.full_mask:
+            raise ValueError('some products from the list are not available in any shop')
+
+        self.ways, self.next_nodes = cheapest_ways(instance)
+        self.remaining = self._remaining_costs()
+
+        # positions and masks of all shops, handy in branch and bound
+        self.direct = _direct_costs(instance)
+        self.positions = np.zeros(instance.n_shops + 1, dtype=np.int64)
+        self.positions[self.nodes] = np.arange(len(self.nodes))
+        self.shop_masks = np.zeros(instance.n_shops + 1, dtype=np.int64)
+        self.shop_masks[self.nodes] = self.masks
+
+    def _remaining_costs(self) -> np.ndarray:
+        # remaining[s, j] - the lowest cost of buying products not in s and returning to the start point
+        # from node j, states are processed from larger sets, because a new product is bought in every shop
+        full_mask = self.instance.full_mask
+        costs = self.ways[self.nodes[:, np.newaxis], self.nodes]
+        remaining = np.empty((full_mask + 1, len(self.nodes)))
+        remaining[full_mask] = costs[:, 0]
+
+        for bought in range(full_mask - 1, -1, -1):
+            shops = np.flatnonzero(self.masks & ~bought)
+            remaining[bought] = (costs[:, shops] + remaining[bought | self.masks[shops], shops]).min(axis=1)
+
+        return remaining
+
+    def bound(self, bought: int) -> np.ndarray:
+        """
+        :param bought: mask of bought products
+        :return: the lowest costs of buying the remaining products from all shops (not only shops
+                 with products from the list)
+        """
+
+        if bought == self.instance.full_mask:
+            return self.ways[:, 0]
+
+        shops = np.flatnonzero(self.masks & ~bought)
+        return (self.ways[:, self.nodes[shops]] + self.remaining[bought | self.masks[shops], shops]).min(axis=1)
+
+    def relaxed_route(self) -> List[int]:
+        """
+        :return: route with the lower bound cost, shops can be repeated on the ways between shops in which
+                 products are bought
+        """
+
+        route = []
+        bought, node = 0, 0
+
+        while bought != self.instance.full_mask:
+            shops = np.flatnonzero(self.masks & ~bought)
+            totals = self.ways[self.nodes[node], self.nodes[shops]] + self.remaining[bought | self.masks[shops], shops]
+            node = int(shops[totals.argmin()])
+            bought |= int(self.masks[node])
+            route.append(int(self.nodes[node]))
+
+        # shops in which products are bought together with the shops on the ways between them
+        path, source = [], 0
+        for target in route:
+            while source != target:
+                source = int(self.next_nodes[source, target])
+                path.append(source)
+
+        return path
+
+    def solve(self, max_nodes: int = MAX_NODES) -> Tuple[Solution, float, bool]:
+        """
+        :param max_nodes: maximal number of partial routes checked by branch and bound
+        :return: solution, lower bound of the cost of solutions and True if the solution is optimal (False if
+                 branch and bound was stopped after max_nodes partial routes before proving it)
+        """
+
+        lower_bound = float(self.remaining[0, 0])
+
+        # repeated visits are skipped, which gives a solution with the cost equal to the bound in most cases
+        route = list(dict.fromkeys(self.relaxed_route()))
+        self.best_route, self.best_cost = route, self.instance.route_cost(route)
+        self.nodes_left = max_nodes
+
+        if self.best_cost > lower_bound + EPSILON:
+            visited = np.zeros(self.instance.n_shops + 1, dtype=bool)
+            visited[0] = True
+            self._branch([], visited, 0, 0, 0.)
+
+            if self.nodes_left >= 0:
+                lower_bound = self.best_cost
+
+        solution = Solution(self.best_route, self.instance.route_cost(self.best_route))
+        return solution, float(min(lower_bound, solution.cost)), bool(solution.cost <= lower_bound + EPSILON)
+
+    def _branch(self, route: List[int], visited: np.ndarray, bought: int, node: int, cost: float) -> None:
+        self.nodes_left -= 1
+        if self.nodes_left < 0:
+            return
+
+        if bought == self.instance.full_mask:
+            total = cost + self.direct[node, 0]
+            if total < self.best_cost:
+                self.best_route, self.best_cost = list(route), total
+
+        # lower bounds of routes continued in every shop, shops in which nothing new is bought are
+        # only on the way to other shops
+        costs = cost + self.direct[node]
+        new_bought = bought | self.shop_masks
+        bounds = np.where(new_bought != bought, self.remaining[new_bought, self.positions], self.bound(bought))
+        totals = costs + bounds
+        totals[visited] = np.inf
+
+        for shop in np.argsort(totals)[:np.count_nonzero(totals < self.best_cost - EPSILON)].tolist():
+            if totals[shop] >= self.best_cost - EPSILON:
+                break
+
+            route.append(shop)
+            visited[shop] = True
+            self._branch(route, visited, int(new_bought[shop]), shop, float(costs[shop]))
+            visited[shop] = False
+            route.pop()
+
+
+def solve_exact(test_data: Union[Dict, ProblemInstance],
+                max_nodes: int = MAX_NODES) -> Tuple[Solution, float, bool]:
+    """
+    :param test_data: dictionary with test data (start position, list, shops, weights) or compiled problem instance
+    :param max_nodes: maximal number of partial routes checked by branch and bound
+    :return: solution, lower bound of the cost of solutions and True if the solution is optimal (False if
+             branch and bound was stopped after max_nodes partial routes before proving it)
+    """
+
+    return ExactSolver(test_data).solve(max_nodes)
@@ -0,0 +1,161 @@
+import json
+import os
+from argparse import ArgumentParser
+from typing import Dict, Union
+
+import numpy as np
+
+from problem_instance import ProblemInstance
+from weights import DenseWeights, dense_to_triangle, weight_model
+
+# binary format: magic bytes, length of the JSON header (uint64, little endian), JSON header describing arrays
+# (dtype, shape and offset from the beginning of the data section) and raw arrays aligned to ALIGNMENT bytes
+MAGIC = b'BEESINST'
+VERSION = 1
+ALIGNMENT = 64
+
+
+def align(offset: int) -> int:
+    """
+    :param offset: offset in bytes
+    :return: the smallest multiple of ALIGNMENT not smaller than the offset
+    """
+
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_binary(test_data: Union[Dict, ProblemInstance], filename: str, cost_matrix: bool = True) -> None:
+    """
+    Save the problem instance in the binary format. Dense weights are stored as the upper triangle if they are
+    symmetric, implicit weight models as their descriptions in the header.
+
+    :param test_data: dictionary with test data or compiled problem instance
+    :param filename: name of the binary file
+    :param cost_matrix: if True, the precomputed weighted-distance matrix is stored as well, so processes that load
+                        the file share it in the page cache instead of calculating their own copies
+    """
+
+    instance = ProblemInstance.of(test_data)
+    header = {'version': VERSION, 'n_shops': instance.n_shops, 'arrays': {}}
+
+    rows, columns = np.nonzero(instance.stock)
+    arrays = {
+        'positions': instance.positions,
+        'q': instance.q,
+        'items': instance.items,
+        'inventory_indptr': np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=instance.n_shops + 1)))),
+        'inventory_indices': columns
+    }
+
+    # implicit weight models are stored as their compact descriptions
+    if isinstance(instance.weight_model, DenseWeights):
+        weights = instance.weights
+        arrays['weights'] = dense_to_triangle(weights) if np.array_equal(weights, weights.T) else weights
+    else:
+        header['weights_model'] = instance.weight_model.to_dict()
+
+    if cost_matrix and isinstance(instance.cost_matrix, np.ndarray):
+        arrays['cost_matrix'] = instance.cost_matrix
+
+    offset = 0
+
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = align(offset + array.nbytes)
+
+    header_bytes = json.dumps(header).encode()
+    data_start = align(len(MAGIC) + 8 + len(header_bytes))
+
+    with open(filename, 'wb') as file:
+        file.write(MAGIC)
+        file.write(len(header_bytes).to_bytes(8, 'little'))
+        file.write(header_bytes)
+
+        for name, array in arrays.items():
+            file.seek(data_start + header['arrays'][name]['offset'])
+            file.write(array.tobytes())
+
+
+def load_binary(filename: str, mmap: bool = True) -> ProblemInstance:
+    """
+    Load the problem instance from the binary file.
+
+    :param filename: name of the binary file
+    :param mmap: if True, arrays are memory-mapped (read only), so all processes that load the same file
+                 share one copy of the data in the page cache
+    :return: compiled problem instance
+    """
+
+    with open(filename, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{filename} is not a binary problem instance file')
+
+        header_length = int.from_bytes(file.read(8), 'little')
+        header = json.loads(file.read(header_length))
+
+    if header['version'] != VERSION:
+        raise ValueError(f'unsupported version of the binary problem instance file: {header["version"]}')
+
+    data_start = align(len(MAGIC) + 8 + header_length)
+    arrays = {}
+
+    for name, description in header['arrays'].items():
+        dtype, shape = np.dtype(description['dtype']), tuple(description['shape'])
+        offset = data_start + description['offset']
+
+        if mmap and np.prod(shape) > 0:
+            arrays[name] = np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=shape)
+        else:
+            arrays[name] = np.fromfile(filename, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+
+    n = header['n_shops']
+    indptr = arrays['inventory_indptr']
+    stock = np.zeros((n + 1, len(arrays['items'])), dtype=bool)
+    stock[np.repeat(np.arange(n + 1), np.diff(indptr)), arrays['inventory_indices']] = True
+
+    if 'weights' in arrays:
+        weights = DenseWeights(arrays['weights'], n + 1)
+    else:
+        weights = weight_model(header['weights_model'], n + 1)
+
+    instance = ProblemInstance.from_arrays(arrays['positions'], arrays['q'], np.asarray(arrays['items']), stock,
+                                           weights, arrays.get('cost_matrix'))
+
+    if mmap:
+        instance.source_file = os.path.abspath(filename)
+
+    return instance
+
+
+def load_instance(filename: str) -> ProblemInstance:
+    """
+    Load the problem instance from the JSON file or from the binary file.
+
+    :param filename: name of the file with data
+    :return: compiled problem instance
+    """
+
+    if filename.endswith('.json'):
+        return ProblemInstance.from_json(filename)
+
+    return load_binary(filename)
+
+
+def convert_json(json_filename: str, binary_filename: str, cost_matrix: bool = True) -> None:
+    """
+    Convert test data from the JSON file to the binary format.
+    """
+
+    save_binary(ProblemInstance.from_json(json_filename), binary_filename, cost_matrix)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('input', type=str, help='name of the JSON file with data')
+    parser.add_argument('output', type=str, help='name of the binary file')
+    parser.add_argument('--no_cost_matrix', action='store_true', help='do not store the precomputed weighted-distance matrix')
+    args = parser.parse_args()
+
+    convert_json(args.input, args.output, not args.no_cost_matrix)
@@ -0,0 +1,109 @@
+import csv
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator
+
+# names of the operations drawn by foragers in BeesColony.random_neighbour()
+MOVES = ['add', 'remove', 'substitute', 'permutation']
+
+
+class Instrumentation:
+    """
+    Statistics of a run of the bees algorithm: time spent in each phase, numbers of evaluations,
+    acceptance rates of moves of foragers and of annealing, and numbers of repairs and fallbacks.
+    It is collected only if it is passed to the colony, otherwise the colony does not measure anything.
+    """
+
+    def __init__(self):
+        self.timings = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.moves_drawn = dict.fromkeys(MOVES, 0)
+        self.moves_accepted = dict.fromkeys(MOVES, 0)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Measure the time of the code executed in the with block.
+
+        :param name: name of the phase
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - start
+            self.calls[name] += 1
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] += n
+
+    def record_moves(self, moves: Iterable[int], accepted: bool) -> None:
+        """
+        :param moves: operations made by the forager (indices of MOVES)
+        :param accepted: True if the route of the forager replaced its patch
+        """
+
+        for move in moves:
+            self.moves_drawn[MOVES[move]] += 1
+            if accepted:
+                self.moves_accepted[MOVES[move]] += 1
+
+    def record_acceptance(self, improvement: bool, accepted: bool) -> None:
+        """
+        :param improvement: True if the new solution is better than the patch
+        :param accepted: True if the new solution replaced the patch
+        """
+
+        if improvement:
+            self.count('improvements')
+        elif accepted:
+            self.count('annealing_acceptances')
+        else:
+            self.count('rejections')
+
+    def to_dict(self) -> Dict:
+        """
+        :return: dictionary with all statistics (acceptance rates of moves are calculated)
+        """
+
+        return {
+            'timings': {name: {'seconds': seconds, 'calls': self.calls[name]}
+                        for name, seconds in self.timings.items()},
+            'counters': dict(self.counters),
+            'moves': {move: {'drawn': self.moves_drawn[move], 'accepted': self.moves_accepted[move],
+                             'acceptance_rate': self.moves_accepted[move] / self.moves_drawn[move]
+                             if self.moves_drawn[move] else 0.}
+                      for move in MOVES}
+        }
+
+    def save(self, filename: str) -> None:
+        """
+        Save statistics to the JSON file or, if the name of the file ends with .csv, to the CSV file
+        with rows (section, name, field, value).
+
+        :param filename: name of the file
+        """
+
+        statistics = self.to_dict()
+
+        if not filename.endswith('.csv'):
+            with open(filename, 'w+') as file:
+                json.dump(statistics, file, indent=2)
+            return
+
+        with open(filename, 'w+', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['section', 'name', 'field', 'value'])
+
+            for name, timing in statistics['timings'].items():
+                for field, value in timing.items():
+                    writer.writerow(['timings', name, field, value])
+            for name, value in statistics['counters'].items():
+                writer.writerow(['counters', name, 'count', value])
+            for name, move in statistics['moves'].items():
+                for field, value in move.items():
+                    writer.writerow(['moves', name, field, value])
@@ -0,0 +1,85 @@
+import time
+from typing import Dict, Union
+
+import numpy as np
+
+from bees_algorithm import BeesColony
+from problem_instance import ProblemInstance
+from worker_pool import call_shared, shared_pool
+
+
+def _run_epoch(instance: ProblemInstance, colony: BeesColony, iterations: int, deadline: float = None) -> BeesColony:
+    # the colony is sent together with its generator of random numbers, so the results do not depend
+    # on which worker runs the colony and what it has run before
+    colony.attach(instance)
+
+    if not colony.patches:
+        colony.initialize()
+
+    for _ in colony.run(colony.iterations_num + iterations, deadline):
+        pass
+
+    return colony
+
+
+def multi_colony_bees_algorithm(colonies: int, workers: int, ns: int, ne: int, nb: int, nre: int, nrb: int,
+                                test_data: Union[Dict, ProblemInstance], neighbourhood_size: float,
+                                iters_without_improvement: float = 150, max_iters: int = 500,
+                                temperature: float = 1000, temp_decay: float = 0.99, *, evaluation: str = 'delta',
+                                neighbours: int = 0, migration_interval: int = 25, migrants: int = 3, seed: int = None,
+                                improve: int = 0, unique_patches: bool = False, time_limit: float = None):
+    """
+    Run independent colonies of the bees algorithm in parallel processes. Every migration_interval iterations
+    the best patches of each colony are sent to the next colony (ring topology) and replace its worst patches.
+
+    :param colonies: number of colonies
+    :param workers: number of worker processes (None means number of processors)
+    :param migration_interval: number of iterations between migrations
+    :param migrants: number of patches sent by each colony during migration
+    :param seed: seed of the random numbers generators (None means fresh entropy), colonies use independent
+                 seed sequences spawned from it
+    :param time_limit: maximal time of the search in seconds (None means no limit)
+    :return: the best solution, iteration in which it was found, number of iterations of the colony that
+             found it and list with the same statistics for each colony
+    Other parameters have the same meaning as in bees_algorithm().
+    """
+
+    deadline = None if time_limit is None else time.time() + time_limit
+    instance = ProblemInstance.of(test_data)
+
+    # spatial index is built once and sent to the workers together with the problem instance
+    if neighbours > 0:
+        instance.spatial_index(neighbours)
+
+    population = [BeesColony(ns, ne, nb, nre, nrb, instance, neighbourhood_size, iters_without_improvement,
+                             temperature, temp_decay, evaluation=evaluation, neighbours=neighbours,
+                             improve=improve, unique_patches=unique_patches, seed=colony_seed)
+                  for colony_seed in np.random.SeedSequence(seed).spawn(colonies)]
+
+    with shared_pool(instance, workers) as executor:
+        while True:
+            active = [c for c, colony in enumerate(population)
+                      if not colony.stopped and colony.iterations_num < max_iters]
+
+            if not active:
+                break
+
+            futures = {c: executor.submit(
+                call_shared, _run_epoch, population[c],
+                min(migration_interval, max_iters - population[c].iterations_num), deadline) for c in active}
+
+            for c, future in futures.items():
+                population[c] = future.result()
+                population[c].attach(instance)
+
+            # migration of the best patches between neighbouring colonies
+            emigrants = [colony.patches[:migrants] for colony in population]
+            for c in active:
+                population[c].immigrate(emigrants[c - 1])
+
+            if deadline is not None and time.time() >= deadline:
+                break
+
+    results = [colony.result() for colony in population]
+    best_solution, best_iteration, iterations_num = min(results, key=lambda x: x[0].cost)
+    return best_solution, best_iteration, iterations_num, results
@@ -0,0 +1,285 @@
+import json
+import math
+from functools import cached_property
+from typing import Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+
+from spatial_index import SpatialIndex
+from weights import DenseWeights, WeightModel, weight_model
+
+# the weighted-distance matrix for implicit weights is precomputed only up to this number of nodes
+DENSE_COST_LIMIT = 2000
+
+
+class ProblemInstance:
+    """
+    Compiled representation of the test data. Start point has index 0 and every shop is stored under
+    the index equal to its identifier, so shop identifiers have to be consecutive integers 1, ..., n.
+    """
+
+    def __init__(self, test_data: Dict):
+        """
+        :param test_data: dictionary with test data (start position, list, shops, weights)
+        """
+
+        shops = sorted(test_data['shops'], key=lambda shop: shop['id'])
+        n = len(shops)
+
+        if [shop['id'] for shop in shops] != list(range(1, n + 1)):
+            raise ValueError('shop identifiers have to be consecutive integers starting from 1')
+
+        start = test_data['start']
+        positions = np.empty((n + 1, 2), dtype=np.float64)
+        positions[0] = start['x'], start['y']
+        q = np.zeros(n + 1, dtype=np.float64)
+
+        for shop in shops:
+            positions[shop['id']] = shop['x'], shop['y']
+            q[shop['id']] = shop['q']
+
+        weights = weight_model(test_data['weights'], n + 1)
+
+        # item availability - stock[i, k] is True if shop i has in stock k-th product from the list,
+        # a product repeated in the list is bought once
+        items = list(dict.fromkeys(test_data['list']))
+        item_index = {item: k for k, item in enumerate(items)}
+        stock = np.zeros((n + 1, len(item_index)), dtype=bool)
+
+        for shop in shops:
+            for item in shop['items']:
+                if item in item_index:
+                    stock[shop['id'], item_index[item]] = True
+
+        self._compile(positions, q, np.array(items, dtype=np.int64), stock, weights)
+
+    @classmethod
+    def from_arrays(cls, positions: np.ndarray, q: np.ndarray, items: np.ndarray, stock: np.ndarray,
+                    weights: Union[np.ndarray, WeightModel], cost_matrix: np.ndarray = None) -> 'ProblemInstance':
+        """
+        Create the problem instance directly from arrays (they are not copied, so they can be memory-mapped).
+
+        :param positions: positions of the start point (index 0) and all shops
+        :param q: queue costs of all shops (0 for the start point)
+        :param items: products from the list
+        :param stock: stock[i, k] is True if shop i has in stock k-th product from the list
+        :param weights: dense weight matrix, its upper triangle without diagonal (row by row) or weight model
+        :param cost_matrix: precomputed weighted-distance matrix (calculated if not given)
+        :return: compiled problem instance
+        """
+
+        instance = cls.__new__(cls)
+        instance._compile(positions, q, items, stock, weights, cost_matrix)
+        return instance
+
+    def _compile(self, positions: np.ndarray, q: np.ndarray, items: np.ndarray, stock: np.ndarray,
+                 weights: Union[np.ndarray, WeightModel], cost_matrix: np.ndarray = None) -> None:
+        self.n_shops = len(positions) - 1
+        self.positions = positions
+        self.q = q
+        self.items = items
+        self.stock = stock
+        self.source_file = None
+        self.weight_model = weights if isinstance(weights, WeightModel) else DenseWeights(weights, self.n_shops + 1)
+
+        # weighted-distance matrix is precomputed for small instances and for the full weight matrix, which
+        # takes as much memory anyway, for large instances with implicit weights or only the triangle
+        # of weights its elements are calculated on demand
+        if cost_matrix is None:
+            full_matrix = isinstance(self.weight_model, DenseWeights) and self.weight_model.values.ndim == 2
+            if full_matrix or self.n_shops + 1 <= DENSE_COST_LIMIT:
+                cost_matrix = np.ascontiguousarray(self.weights * self.distances)
+            else:
+                cost_matrix = LazyCostMatrix(positions, self.weight_model)
+
+        self.cost_matrix = cost_matrix
+
+        # the same availability as lists of column indices of the stock matrix, handy in scalar hot loops,
+        # built from all nonzero elements at once (most shops of a large network have nothing from the list)
+        shops, indices = np.nonzero(self.stock)
+        indices_list = indices.tolist()
+        with_items, starts = np.unique(shops, return_index=True)
+        ends = starts[1:].tolist() + [len(indices_list)]
+
+        # bitsets - k-th bit of the mask corresponds to k-th product from the list
+        self.shop_item_indices: List[Tuple[int, ...]] = [()] * (self.n_shops + 1)
+        self.shop_masks: List[int] = [0] * (self.n_shops + 1)
+        for shop, start, end in zip(with_items.tolist(), starts.tolist(), ends):
+            self.shop_item_indices[shop] = tuple(indices_list[start:end])
+            self.shop_masks[shop] = sum(1 << k for k in indices_list[start:end])
+
+        by_item = np.argsort(indices, kind='stable')
+        bounds = np.cumsum(np.bincount(indices, minlength=self.stock.shape[1]))[:-1]
+        self.index_shops: List[List[int]] = [column.tolist() for column in np.split(shops[by_item], bounds)]
+
+        self.item_list: List[int] = self.items.tolist()
+        self.full_mask = (1 << len(self.item_list)) - 1
+
+        self._spatial_indexes: Dict[int, SpatialIndex] = {}
+
+    def __getstate__(self) -> Dict:
+        # instance loaded from the binary file is sent to other processes as the name of the file,
+        # so they memory-map the same file instead of receiving copies of the arrays, spatial indexes
+        # already built are sent with it, because they are not stored in the file
+        if self.source_file is not None:
+            return {'source_file': self.source_file, '_spatial_indexes': self._spatial_indexes}
+
+        # matrices derived from the positions and the weights are calculated again when needed
+        state = self.__dict__.copy()
+        state.pop('weights', None)
+        state.pop('distances', None)
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        if set(state) == {'source_file', '_spatial_indexes'}:
+            from instance_io import load_binary
+            state = dict(load_binary(state['source_file']).__dict__, _spatial_indexes=state['_spatial_indexes'])
+        self.__dict__.update(state)
+
+    @cached_property
+    def weights(self) -> np.ndarray:
+        """
+        Dense weight matrix (built on the first use if the instance stores only the triangle or the weight model).
+        """
+
+        return self.weight_model.matrix(self.n_shops + 1)
+
+    @cached_property
+    def distances(self) -> np.ndarray:
+        diff = self.positions[:, np.newaxis, :] - self.positions[np.newaxis, :, :]
+        return np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+
+    @classmethod
+    def of(cls, test_data: Union[Dict, 'ProblemInstance']) -> 'ProblemInstance':
+        """
+        Compile test data unless it is already compiled.
+
+        :param test_data: dictionary with test data or compiled problem instance
+        :return: compiled problem instance
+        """
+
+        if isinstance(test_data, cls):
+            return test_data
+
+        return cls(test_data)
+
+    @classmethod
+    def from_json(cls, filename: str) -> 'ProblemInstance':
+        """
+        Load test data from the JSON file and compile it.
+
+        :param filename: name of the JSON file with data
+        :return: compiled problem instance
+        """
+
+        with open(filename, 'r') as file:
+            return cls(json.load(file))
+
+    def spatial_index(self, k: int, shop_neighbours: np.ndarray = None) -> SpatialIndex:
+        """
+        Candidate lists of k nearest shops, built on the first use and then reused.
+
+        :param k: length of the candidate lists
+        :param shop_neighbours: candidate lists computed earlier for the same shops (see SpatialIndex)
+        :return: spatial index of the shops
+        """
+
+        if k not in self._spatial_indexes:
+            self._spatial_indexes[k] = SpatialIndex(self.positions, self.index_shops, k,
+                                                    shop_neighbours=shop_neighbours)
+
+        return self._spatial_indexes[k]
+
+    def items_of(self, mask: int) -> List[int]:
+        """
+        Decode products from the bitset.
+
+        :param mask: bitset of products from the list
+        :return: list of products
+        """
+
+        items = []
+
+        while mask:
+            lowest = mask & -mask
+            items.append(self.item_list[lowest.bit_length() - 1])
+            mask ^= lowest
+
+        return items
+
+    def route_cost(self, route: Iterable[int]) -> float:
+        """
+        Calculate the cost of visiting given shops in given order, starting and finishing at the start point.
+
+        :param route: ordered identifiers of visited shops
+        :return: cost of the route
+        """
+
+        route = np.fromiter(route, dtype=np.int64)
+
+        if len(route) == 0:
+            return 0.
+
+        path = np.concatenate(([0], route, [0]))
+        return float(self.cost_matrix[path[:-1], path[1:]].sum() + self.q[route].sum())
+
+
+class LazyCostMatrix:
+    """
+    Weighted-distance matrix with elements calculated on demand from the positions and the weight model.
+    It is indexed like the dense matrix: cost_matrix[i, j] with integers or with arrays of indices.
+    """
+
+    def __init__(self, positions: np.ndarray, model: WeightModel):
+        self.positions = positions
+        self.model = model
+        self._xs = positions[:, 0].tolist()
+        self._ys = positions[:, 1].tolist()
+
+    def __getitem__(self, index: Tuple) -> Union[float, np.ndarray]:
+        i, j = index
+
+        if isinstance(i, (int, np.integer)) and isinstance(j, (int, np.integer)):
+            distance = math.hypot(self._xs[i] - self._xs[j], self._ys[i] - self._ys[j])
+            return self.model.weight(i, j) * distance
+
+        i, j = np.asarray(i), np.asarray(j)
+        diff = self.positions[i] - self.positions[j]
+        return self.model.weights(i, j) * np.sqrt((diff ** 2).sum(axis=-1))
+
+
+class StartCostMatrix:
+    """
+    Weighted-distance matrix of one customer of the shop network: the matrix of the network, shared read-only
+    by all customers, with the row and the column of the start point of the customer. It is indexed like
+    the dense matrix: cost_matrix[i, j] with integers or with arrays of indices.
+    """
+
+    __slots__ = ('shared', 'start_row', 'start_column')
+
+    def __init__(self, shared: np.ndarray, start_row: np.ndarray, start_column: np.ndarray):
+        """
+        :param shared: weighted-distance matrix of the network
+        :param start_row: weighted distances from the start point to all nodes
+        :param start_column: weighted distances from all nodes to the start point
+        """
+
+        self.shared = shared
+        self.start_row = start_row
+        self.start_column = start_column
+
+    def __getitem__(self, index: Tuple) -> Union[float, np.ndarray]:
+        i, j = index
+
+        # roads between shops are the most frequent in the hot loops of the search
+        if i.__class__ is int and j.__class__ is int and i and j:
+            return self.shared[index]
+
+        if isinstance(i, (int, np.integer)) and isinstance(j, (int, np.integer)):
+            if i == 0:
+                return self.start_row[j]
+            return self.start_column[i] if j == 0 else self.shared[i, j]
+
+        i, j = np.broadcast_arrays(np.asarray(i), np.asarray(j))
+        costs = np.where(i == 0, self.start_row[j], self.shared[i, j])
+        return np.where(j == 0, self.start_column[i], costs)
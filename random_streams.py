@@ -0,0 +1,127 @@
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+# minimal number of uniform numbers drawn at once when a bee has used up its block
+MIN_BLOCK = 64
+
+
+class RandomStream:
+    """
+    Random numbers of one bee. Uniform numbers are drawn in blocks with a single NumPy call and turned
+    into indices and choices one at a time. When the block is used up, next blocks are drawn from the own
+    generator of the bee created from its key, so the numbers depend only on the seed and the key of the bee,
+    not on the order in which bees are run.
+    """
+
+    __slots__ = ('_values', '_position', '_entropy', '_key', '_generator')
+
+    def __init__(self, values: np.ndarray, entropy: Union[int, Sequence[int]], key: Tuple[int, ...]):
+        """
+        :param values: first block of uniform numbers from [0, 1)
+        :param entropy: entropy of the seed sequence of the colony
+        :param key: spawn key of the seed sequence of the bee
+        """
+
+        self._values = values.tolist()
+        self._position = 0
+        self._entropy = entropy
+        self._key = key
+        self._generator = None
+
+    def random(self) -> float:
+        if self._position == len(self._values):
+            if self._generator is None:
+                self._generator = np.random.default_rng(np.random.SeedSequence(self._entropy, spawn_key=self._key))
+            self._values = self._generator.random(max(len(self._values), MIN_BLOCK)).tolist()
+            self._position = 0
+
+        value = self._values[self._position]
+        self._position += 1
+        return value
+
+    def randrange(self, n: int) -> int:
+        return int(self.random() * n)
+
+    def randint(self, a: int, b: int) -> int:
+        return a + int(self.random() * (b - a + 1))
+
+    def choice(self, sequence: Sequence):
+        return sequence[int(self.random() * len(sequence))]
+
+    def pair(self, n: int) -> Tuple[int, int]:
+        """
+        :return: two different random numbers from range(n)
+        """
+
+        i = int(self.random() * n)
+        j = int(self.random() * (n - 1))
+        return i, j + (j >= i)
+
+    def permutation(self, n: int) -> List[int]:
+        """
+        :return: random permutation of range(n)
+        """
+
+        keys = [self.random() for _ in range(n)]
+        return sorted(range(n), key=keys.__getitem__)
+
+
+class RandomStreams:
+    """
+    Random numbers of a colony. The colony has its own generator created from a seed sequence, and blocks
+    of uniform numbers of all bees of an iteration are drawn from it at once. Bees can use their streams
+    in any order, also in other threads or processes, and get the same numbers, so the search is reproducible
+    from the seed. Colonies of one search use independent seed sequences spawned from the seed of the search.
+    """
+
+    def __init__(self, seed: Union[int, np.random.SeedSequence] = None):
+        """
+        :param seed: seed or seed sequence (None means fresh entropy from the operating system)
+        """
+
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.generator = np.random.default_rng(self.seed_sequence)
+        self.draws = 0
+
+    def streams(self, blocks: Sequence[int]) -> List[RandomStream]:
+        """
+        :param blocks: numbers of uniform numbers in the first blocks of the streams of bees
+        :return: streams of bees
+        """
+
+        values = self.generator.random(sum(blocks))
+        bounds = np.cumsum(blocks).tolist()
+        key = self.seed_sequence.spawn_key + (self.draws,)
+        self.draws += 1
+
+        return [RandomStream(values[end - block:end], self.seed_sequence.entropy, key + (i,))
+                for i, (block, end) in enumerate(zip(blocks, bounds))]
+
+    def random(self, n: int) -> List[float]:
+        """
+        :return: n uniform numbers from [0, 1)
+        """
+
+        return self.generator.random(n).tolist()
+
+    def to_dict(self) -> Dict:
+        """
+        :return: seed sequence, number of drawn blocks and state of the generator, from which the streams
+                 can be restored exactly
+        """
+
+        return {'entropy': self.seed_sequence.entropy, 'spawn_key': list(self.seed_sequence.spawn_key),
+                'draws': self.draws, 'state': self.generator.bit_generator.state}
+
+    @classmethod
+    def from_dict(cls, state: Dict) -> 'RandomStreams':
+        """
+        :param state: dictionary created by to_dict()
+        :return: random numbers of the colony in the saved state
+        """
+
+        streams = cls(np.random.SeedSequence(state['entropy'], spawn_key=tuple(state['spawn_key'])))
+        streams.draws = state['draws']
+        streams.generator.bit_generator.state = state['state']
+        return streams
@@ -0,0 +1,103 @@
+from typing import Sequence
+
+import numpy as np
+
+from problem_instance import ProblemInstance
+
+# maximal length of the segment moved by Or-opt
+OR_OPT_SEGMENT = 3
+
+
+def improve_route(instance: ProblemInstance, route: Sequence[int], max_moves: int = 10,
+                  neighbours: int = 8) -> np.ndarray:
+    """
+    Improve the order of shops on the route with 2-opt and Or-opt moves. In every step costs of all moves
+    are calculated at once and the best improving move is made. Costs are not assumed to be symmetric,
+    so 2-opt takes into account that the reversed segment is traversed in the opposite direction.
+    Only moves creating an edge to one of the nearest shops on the route (neighbour lists) are considered.
+
+    :param instance: compiled problem instance
+    :param route: ordered identifiers of visited shops
+    :param max_moves: maximal number of made moves
+    :param neighbours: length of the neighbour lists (0 means that all moves are considered)
+    :return: ordered identifiers of visited shops
+    """
+
+    route = np.asarray(route, dtype=np.int64)
+    n = len(route)
+
+    if n < 2:
+        return route
+
+    # local indices: 0 is the start point, i is the i-th shop of the route, the set of nodes never changes
+    nodes = np.concatenate(([0], route))
+    costs = instance.cost_matrix[nodes[:, np.newaxis], nodes[np.newaxis, :]]
+
+    if 0 < neighbours < n:
+        far = costs + np.diag(np.full(n + 1, np.inf))
+        nearest = np.argpartition(far, neighbours - 1, axis=1)[:, :neighbours]
+        near = np.zeros((n + 1, n + 1), dtype=bool)
+        np.put_along_axis(near, nearest, True, axis=1)
+    else:
+        near = np.ones((n + 1, n + 1), dtype=bool)
+
+    path = np.concatenate(([0], np.arange(1, n + 1), [0]))
+    indices = np.arange(n + 2)
+    lengths = range(1, min(OR_OPT_SEGMENT, n - 1) + 1)
+
+    # moves that do not change the path depend only on positions, so they are found once
+    same_2opt = np.tril(np.ones((n, n), dtype=bool))
+    same_or_opt = {length: (indices[np.newaxis, :n + 1] >= indices[1:n - length + 2, np.newaxis] - 1)
+                           & (indices[np.newaxis, :n + 1] <= indices[1:n - length + 2, np.newaxis] + length - 1)
+                   for length in lengths}
+
+    for _ in range(max_moves):
+        # costs and neighbour lists permuted to the order of the path, so all moves are evaluated with slices
+        path_costs = costs[np.ix_(path, path)]
+        path_near = near[np.ix_(path, path)]
+        forward = path_costs[indices[:-1], indices[1:]]
+        backward = path_costs[indices[1:], indices[:-1]]
+        forward_sums = np.concatenate(([0.], np.cumsum(forward)))
+        backward_sums = np.concatenate(([0.], np.cumsum(backward)))
+
+        best_delta, best_path = -1e-9, None
+
+        # 2-opt: reverse the segment path[a..b], rows are a = 1, ..., n and columns are b = 1, ..., n
+        delta = (path_costs[:n, 1:n + 1] + path_costs[1:n + 1, 2:n + 2]
+                 - forward[:n, np.newaxis] - forward[np.newaxis, 1:n + 1]
+                 + (backward_sums[1:n + 1] - forward_sums[1:n + 1])[np.newaxis, :]
+                 - (backward_sums[1:n + 1] - forward_sums[1:n + 1])[:, np.newaxis])
+        delta[same_2opt | ~path_near[:n, 1:n + 1]] = np.inf
+        a, b = np.unravel_index(np.argmin(delta), delta.shape)
+
+        if delta[a, b] < best_delta:
+            best_delta = delta[a, b]
+            a, b = a + 1, b + 1
+            best_path = np.concatenate((path[:a], path[a:b + 1][::-1], path[b + 1:]))
+
+        # Or-opt: move the segment path[a..e] between path[j] and path[j + 1],
+        # rows are a = 1, ..., n - length + 1 and columns are j = 0, ..., n
+        for length in lengths:
+            m = n - length + 1
+            first = indices[1:m + 1]
+            removal = forward[first - 1] + forward[first + length - 1] - path_costs[first - 1, first + length]
+            delta = (path_costs[:n + 1, 1:m + 1].T + path_costs[length:m + length, 1:n + 2]
+                     - forward[np.newaxis, :n + 1] - removal[:, np.newaxis])
+            delta[same_or_opt[length]
+                  | ~(path_near[:n + 1, 1:m + 1].T | path_near[length:m + length, 1:n + 2])] = np.inf
+            a, j = np.unravel_index(np.argmin(delta), delta.shape)
+
+            if delta[a, j] < best_delta:
+                best_delta = delta[a, j]
+                a += 1
+                e = a + length - 1
+                rest = np.concatenate((path[:a], path[e + 1:]))
+                position = j + 1 if j < a else j + 1 - length
+                best_path = np.concatenate((rest[:position], path[a:e + 1], rest[position:]))
+
+        if best_path is None:
+            break
+
+        path = best_path
+
+    return nodes[path[1:-1]]
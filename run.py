@@ -3,39 +3,140 @@
 import json
 from argparse import ArgumentParser
 
-from bees_algorithm import bees_algorithm
+from bees_algorithm import Progress, add_bees_arguments, bees_algorithm
+from evaluation_cache import EvaluationCache
+from exact_solver import EXACT_MODES, solve_exact, use_exact
+from instrumentation import Instrumentation
+from multi_colony import multi_colony_bees_algorithm
+from instance_io import load_instance
+from solution import load_routes
+
+
+class ProgressPrinter:
+    """
+    Callback printing the best cost as soon as it improves.
+    """
+
+    def __init__(self):
+        self.best_cost = float('inf')
+
+    def __call__(self, progress: Progress) -> None:
+        if progress.best_cost < self.best_cost:
+            self.best_cost = progress.best_cost
+            print(f'Iteration {progress.iteration}: cost {progress.best_cost}, {progress.elapsed:.2f} s, '
+                  f'{progress.evaluations} evaluations', flush=True)
+
 
 if __name__ == '__main__':
     parser = ArgumentParser()
-    parser.add_argument('--ns', default=50, type=int, help='number of scouts')
-    parser.add_argument('--ne', default=20, type=int, help='number of elite solutions')
-    parser.add_argument('--nb', default=30, type=int, help='number of the best solutions')
-    parser.add_argument('--nre', default=5, type=int, help='number of foragers for each elite solution')
-    parser.add_argument('--nrb', default=3, type=int, help='number of foragers for each best, but not elite solution')
-    parser.add_argument('--d', default=6, type=int, help='Levenshtein distance in which we do local search')
-    parser.add_argument('--improve_iters', default=150, type=int, help='max number of iterations without improvement - stop condition')
-    parser.add_argument('--max_iters', default=500, type=int, help='maximal number of iterations')
-    parser.add_argument('--temperature', default=1000, type=float, help='initial annealing temperature (temperature = 0 means no annealing)')
-    parser.add_argument('--decay', default=0.99, type=float, help='annealing temperature multiplier (how fast temperature should decay)')
-    parser.add_argument('--filename', required=True, type=str, help='name of the JSON file with data')
+    add_bees_arguments(parser)
+    parser.add_argument('--unique_patches', action='store_true', help='keep only patches with distinct routes')
+    parser.add_argument('--cache_size', default=0, type=int, help='maximal number of routes in the cache of evaluated routes (0 means no caching, single colony and batch evaluation only, the delta evaluation does not cost routes of foragers from scratch)')
+    parser.add_argument('--colonies', default=1, type=int, help='number of independent colonies run in parallel')
+    parser.add_argument('--workers', type=int, help='number of worker processes for colonies (default: number of processors)')
+    parser.add_argument('--migration_interval', default=25, type=int, help='number of iterations between migrations of the best patches between colonies')
+    parser.add_argument('--migrants', default=3, type=int, help='number of patches sent by each colony during migration')
+    parser.add_argument('--seed', type=int, help='seed of the random numbers generators (default: fresh entropy)')
+    parser.add_argument('--time_limit', type=float, help='maximal time of the search in seconds, the best solution found so far is returned')
+    parser.add_argument('--progress', action='store_true', help='print the best cost whenever it improves (single colony only)')
+    parser.add_argument('--stats', type=str, help='name of the JSON or CSV file to save statistics of the run (single colony only)')
+    parser.add_argument('--checkpoint', type=str, help='name of the checkpoint file, the search is continued from it if it exists (single colony only)')
+    parser.add_argument('--checkpoint_interval', default=25, type=int, help='number of iterations between checkpoints')
+    parser.add_argument('--warm_start', type=str, help='name of the JSON file with known solutions (output of earlier runs or checkpoint) added to the initial population (single colony only)')
+    parser.add_argument('--exact', default='auto', choices=EXACT_MODES, help='when the exact solver is used instead of the bees algorithm: for small instances, always or never')
+    parser.add_argument('--filename', required=True, type=str, help='name of the JSON or binary file with data')
     parser.add_argument('--output', type=str, help='name of the JSON file to save generated solution')
     args = parser.parse_args()
 
-    with open(args.filename, 'r') as file:
-        data = json.load(file)
-
-    best_solution, best_iteration, iterations_num = bees_algorithm(
-        args.ns,
-        args.ne,
-        args.nb,
-        args.nre,
-        args.nrb,
-        data,
-        args.d,
-        args.improve_iters,
-        args.max_iters,
-        args.temperature,
-        args.decay)
+    if args.cache_size > 0 and args.evaluation != 'batch':
+        parser.error('--cache_size requires --evaluation batch')
+
+    if args.colonies > 1:
+        single_colony = {'--cache_size': args.cache_size > 0, '--progress': args.progress, '--stats': args.stats,
+                         '--checkpoint': args.checkpoint, '--warm_start': args.warm_start}
+        for flag, given in single_colony.items():
+            if given:
+                parser.error(f'{flag} cannot be used with --colonies greater than 1')
+
+    # the instance is compiled once, also to decide whether it is small enough for the exact solver
+    data = load_instance(args.filename)
+
+    exact_solution, optimal = None, False
+    if use_exact(data, args.exact):
+        exact_solution, lower_bound, optimal = solve_exact(data)
+        print(f'Exact solver: cost {exact_solution.cost}, lower bound {lower_bound}'
+              f'{"" if optimal else " (the solution is not proven optimal)"}')
+
+    # in the automatic mode the bees algorithm continues from the solution of the exact solver
+    # if branch and bound was stopped before proving that it is optimal
+    if exact_solution is not None and (optimal or args.exact == 'always'):
+        best_solution, best_iteration, iterations_num = exact_solution, 0, 0
+    elif args.colonies > 1:
+        best_solution, best_iteration, iterations_num, colonies_results = multi_colony_bees_algorithm(
+            colonies=args.colonies,
+            workers=args.workers,
+            ns=args.ns,
+            ne=args.ne,
+            nb=args.nb,
+            nre=args.nre,
+            nrb=args.nrb,
+            test_data=data,
+            neighbourhood_size=args.d,
+            iters_without_improvement=args.improve_iters,
+            max_iters=args.max_iters,
+            temperature=args.temperature,
+            temp_decay=args.decay,
+            evaluation=args.evaluation,
+            neighbours=args.neighbours,
+            migration_interval=args.migration_interval,
+            migrants=args.migrants,
+            seed=args.seed,
+            improve=args.improve,
+            unique_patches=args.unique_patches,
+            time_limit=args.time_limit)
+
+        for i, (solution, iteration, iterations) in enumerate(colonies_results, 1):
+            print(f'Colony {i}: cost {solution.cost}, best iteration {iteration}, number of iterations {iterations}')
+    else:
+        cache = EvaluationCache(args.cache_size) if args.cache_size > 0 else None
+        stats = Instrumentation() if args.stats else None
+        best_solution, best_iteration, iterations_num = bees_algorithm(
+            ns=args.ns,
+            ne=args.ne,
+            nb=args.nb,
+            nre=args.nre,
+            nrb=args.nrb,
+            test_data=data,
+            neighbourhood_size=args.d,
+            iters_without_improvement=args.improve_iters,
+            max_iters=args.max_iters,
+            temperature=args.temperature,
+            temp_decay=args.decay,
+            evaluation=args.evaluation,
+            neighbours=args.neighbours,
+            cache=cache,
+            improve=args.improve,
+            unique_patches=args.unique_patches,
+            time_limit=args.time_limit,
+            callback=ProgressPrinter() if args.progress else None,
+            stats=stats,
+            seed=args.seed,
+            routes=(load_routes(args.warm_start) if args.warm_start else []) +
+                   ([exact_solution.route] if exact_solution is not None else []),
+            checkpoint=args.checkpoint,
+            checkpoint_interval=args.checkpoint_interval)
+
+        if stats is not None:
+            stats.save(args.stats)
+
+        if cache is not None:
+            print(f'Evaluation cache: {cache}')
+
+    if exact_solution is not None and exact_solution.cost < best_solution.cost:
+        best_solution, best_iteration = exact_solution, 0
+
+    # solution is converted to the dictionary with products bought in each shop only for the output
+    best_solution = best_solution.to_dict(data)
 
     print(f'Solution: {best_solution}')
     print(f'Best iteration: {best_iteration}')
@@ -0,0 +1,115 @@
+import json
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from problem_instance import DENSE_COST_LIMIT, ProblemInstance, StartCostMatrix
+from spatial_index import SpatialIndex
+from weights import DenseWeights, weight_model
+
+
+class ShopNetwork:
+    """
+    Shops (positions, queue costs, inventories) and road weights without the start point and the shopping
+    list. Everything that depends only on the shops is computed once, so problem instances for many
+    customers with different start points and lists are created in time linear in the number of shops.
+    The start point of every instance has index 0 and uses the weights of the roads from index 0.
+    """
+
+    def __init__(self, test_data: Dict):
+        """
+        :param test_data: dictionary with shops and weights as in the test data (start and list are ignored)
+        """
+
+        shops = sorted(test_data['shops'], key=lambda shop: shop['id'])
+        n = len(shops)
+
+        if [shop['id'] for shop in shops] != list(range(1, n + 1)):
+            raise ValueError('shop identifiers have to be consecutive integers starting from 1')
+
+        self.n_shops = n
+        self.positions = np.zeros((n + 1, 2), dtype=np.float64)
+        self.q = np.zeros(n + 1, dtype=np.float64)
+
+        # shops that have in stock each product (of all products in all shops)
+        item_shops = {}
+
+        for shop in shops:
+            self.positions[shop['id']] = shop['x'], shop['y']
+            self.q[shop['id']] = shop['q']
+            for item in shop['items']:
+                item_shops.setdefault(int(item), []).append(shop['id'])
+
+        self.item_shops: Dict[int, np.ndarray] = {item: np.unique(ids) for item, ids in item_shops.items()}
+        self.weight_model = weight_model(test_data['weights'], n + 1)
+
+        # weighted distances between shops are precomputed if instances use the dense cost matrix, the matrix
+        # is shared by all customers and only the row and the column of the start point are calculated for each
+        self.weights = None
+        self.cost_matrix = None
+
+        full_matrix = isinstance(self.weight_model, DenseWeights) and self.weight_model.values.ndim == 2
+        if full_matrix or n + 1 <= DENSE_COST_LIMIT:
+            self.weights = self.weight_model.matrix(n + 1)
+            diff = self.positions[:, np.newaxis, :] - self.positions[np.newaxis, :, :]
+            self.cost_matrix = self.weights * np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+            self.cost_matrix.flags.writeable = False
+
+        self._shop_neighbours: Dict[int, np.ndarray] = {}
+
+    @classmethod
+    def from_json(cls, filename: str) -> 'ShopNetwork':
+        """
+        :param filename: name of the JSON file with test data
+        :return: network of shops from the test data
+        """
+
+        with open(filename, 'r') as file:
+            return cls(json.load(file))
+
+    def shop_neighbours(self, k: int) -> np.ndarray:
+        """
+        :param k: length of the candidate lists
+        :return: candidate lists of k nearest shops of every shop (see SpatialIndex), built on the first use
+        """
+
+        if k not in self._shop_neighbours:
+            self._shop_neighbours[k] = SpatialIndex(self.positions, [], k).neighbours
+
+        return self._shop_neighbours[k]
+
+    def instance(self, start: Dict, items: Iterable[int], neighbours: int = 0) -> ProblemInstance:
+        """
+        Create the problem instance of one customer.
+
+        :param start: start position of the customer (dictionary with x and y)
+        :param items: list of products to buy
+        :param neighbours: length of candidate lists of the spatial index prepared for the instance
+                           (0 means no spatial index)
+        :return: compiled problem instance
+        """
+
+        items: List[int] = list(dict.fromkeys(int(item) for item in items))
+        stock = np.zeros((self.n_shops + 1, len(items)), dtype=bool)
+
+        for k, item in enumerate(items):
+            if item not in self.item_shops:
+                raise ValueError(f'product {item} is not available in any shop')
+            stock[self.item_shops[item], k] = True
+
+        positions = self.positions.copy()
+        positions[0] = start['x'], start['y']
+        cost_matrix = None
+
+        if self.cost_matrix is not None:
+            distances = np.sqrt(((positions - positions[0]) ** 2).sum(axis=1))
+            cost_matrix = StartCostMatrix(self.cost_matrix, self.weights[0, :] * distances,
+                                          self.weights[:, 0] * distances)
+
+        instance = ProblemInstance.from_arrays(positions, self.q, np.array(items, dtype=np.int64), stock,
+                                               self.weight_model, cost_matrix)
+
+        if neighbours > 0:
+            instance.spatial_index(neighbours, self.shop_neighbours(neighbours))
+
+        return instance
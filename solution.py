@@ -0,0 +1,94 @@
+import json
+from array import array
+from typing import Dict, Iterable, List, Tuple
+
+from problem_instance import ProblemInstance
+
+
+class Solution:
+    """
+    Route with its cost. The route is stored as a compact array of shop identifiers and products are assigned
+    to shops only when they are needed, so bees in the main loop do not build lists of products.
+    """
+
+    __slots__ = ('route', 'cost', '_items')
+
+    def __init__(self, route: Iterable[int], cost: float):
+        """
+        :param route: ordered identifiers of visited shops
+        :param cost: cost of the route
+        """
+
+        self.route = route if isinstance(route, array) else array('i', route)
+        self.cost = cost
+        self._items = None
+
+    def __len__(self) -> int:
+        return len(self.route)
+
+    def __repr__(self) -> str:
+        return f'Solution(route={self.route.tolist()}, cost={self.cost})'
+
+    @property
+    def key(self) -> bytes:
+        """
+        Hashable representation of the route - identical routes have equal keys.
+        """
+
+        return self.route.tobytes()
+
+    def items(self, instance: ProblemInstance) -> List[Tuple[int, List]]:
+        """
+        Assign products to shops on the route, each product is bought in the first shop that has it in stock.
+
+        :param instance: compiled problem instance
+        :return: ordered list of shops with lists of products to buy in each shop
+        """
+
+        if self._items is None:
+            products_mask = instance.full_mask
+            self._items = []
+
+            for shop in self.route:
+                bought = products_mask & instance.shop_masks[shop]
+                self._items.append((shop, instance.items_of(bought)))
+                products_mask ^= bought
+
+        return self._items
+
+    def to_dict(self, instance: ProblemInstance) -> Dict:
+        """
+        :param instance: compiled problem instance
+        :return: dictionary with the solution (shops with products to buy in each shop) and its cost
+        """
+
+        return {'solution': self.items(instance), 'cost': self.cost}
+
+    @classmethod
+    def from_dict(cls, solution: Dict) -> 'Solution':
+        """
+        :param solution: dictionary with the solution (shops with products to buy in each shop) and its cost
+        :return: solution with the same route and cost
+        """
+
+        return cls((shop for shop, _ in solution['solution']), solution['cost'])
+
+
+def load_routes(filename: str) -> List[List[int]]:
+    """
+    Read routes of known solutions for the warm start of the search.
+
+    :param filename: name of the JSON file with the solution saved by run.py, list of such solutions,
+                     list of routes or checkpoint of the search (routes of its patches are read)
+    :return: list of routes
+    """
+
+    with open(filename, 'r') as file:
+        data = json.load(file)
+
+    if isinstance(data, dict):
+        data = data['patches'] if 'patches' in data else [data]
+
+    return [[shop for shop, _ in solution['solution']] if 'solution' in solution else
+            solution['route'] if 'route' in solution else list(solution)
+            for solution in data]
@@ -0,0 +1,206 @@
+#!/usr/bin/python
+
+import asyncio
+import itertools
+import json
+import os
+import time
+from argparse import ArgumentParser
+from collections import deque
+from typing import Dict
+
+import numpy as np
+
+from batch_solve import solve_in_worker, solver_pool
+from bees_algorithm import add_bees_arguments
+from shop_network import ShopNetwork
+
+# time given to the worker process above the time limit of the search before the request fails, a request
+# still waiting in the queue is then cancelled, but a running search cannot be interrupted and keeps its worker
+# until the search reaches its own time limit
+GRACE_TIME = 5.
+
+
+class SolveServer:
+    """
+    Long-running server holding the network of shops in memory and solving problems of customers in a pool
+    of processes, so the event loop only receives requests and sends results. The protocol is line based:
+    every line sent by the client is a JSON request and the server answers with one JSON line.
+
+    Requests are {"start": {"x": ..., "y": ...}, "list": [...], "id": ..., "time_limit": ...} (id and time limit
+    are optional) or {"command": "metrics"}. Identical requests solved at the same time are solved once.
+    """
+
+    def __init__(self, network: ShopNetwork, workers: int = None, time_limit: float = 10.,
+                 max_time_limit: float = 60., seed: int = 0, **params):
+        """
+        :param network: network of shops
+        :param workers: number of worker processes (None means number of processors)
+        :param time_limit: time limit of the search used if the request does not give its own
+        :param max_time_limit: maximal time limit of the search which can be requested
+        :param seed: seed of the random numbers generators, i-th solved request uses seed + i
+        :param params: keyword arguments of bees_algorithm()
+        """
+
+        self.network = network
+        self.time_limit = time_limit
+        self.max_time_limit = max_time_limit
+        self.params = params
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = solver_pool(network, self.workers)
+        # start the worker processes before any connection is open, otherwise they inherit its socket
+        # and the connection is not closed when the server closes it
+        self.executor.submit(int).result()
+
+        self._seeds = itertools.count(seed)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._latencies = deque(maxlen=1000)
+        self.counters = dict.fromkeys(['requests', 'solved', 'coalesced', 'errors', 'timeouts'], 0)
+
+    async def solve(self, request: Dict) -> Dict:
+        """
+        :param request: dictionary with start position and list of products (and optional id and time limit)
+        :return: dictionary with the solution (see solve_request()) or with the error message
+        """
+
+        received = time.perf_counter()
+        self.counters['requests'] += 1
+
+        time_limit = min(float(request.get('time_limit', self.time_limit)), self.max_time_limit)
+        key = json.dumps([request.get('start'), request.get('list'), time_limit], sort_keys=True)
+        task = self._in_flight.get(key)
+
+        if task is None:
+            params = dict(self.params, time_limit=time_limit)
+            problem = {'start': request.get('start'), 'list': request.get('list')}
+            future = asyncio.get_running_loop().run_in_executor(
+                self.executor, solve_in_worker, problem, next(self._seeds), params)
+
+            task = asyncio.ensure_future(asyncio.wait_for(future, time_limit + GRACE_TIME))
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            self._in_flight[key] = task
+            self.counters['solved'] += 1
+        else:
+            self.counters['coalesced'] += 1
+
+        try:
+            result = dict(await asyncio.shield(task))
+        except asyncio.TimeoutError:
+            self.counters['timeouts'] += 1
+            result = {'error': 'time limit exceeded'}
+        except Exception as error:
+            # errors of the worker are sent to the client, the server keeps serving other requests
+            result = {'error': f'{type(error).__name__}: {error}'}
+
+        if 'error' in result:
+            self.counters['errors'] += 1
+        if 'id' in request:
+            result['id'] = request['id']
+
+        self._latencies.append(time.perf_counter() - received)
+        return result
+
+    def metrics(self) -> Dict:
+        """
+        :return: dictionary with numbers of requests, queue depth and latencies of recent requests in seconds
+        """
+
+        latencies = np.array(self._latencies)
+        in_flight = len(self._in_flight)
+
+        return dict(self.counters, in_flight=in_flight, queued=max(in_flight - self.workers, 0), latency={
+            'mean': float(latencies.mean()) if len(latencies) else 0.,
+            'p50': float(np.percentile(latencies, 50)) if len(latencies) else 0.,
+            'p95': float(np.percentile(latencies, 95)) if len(latencies) else 0.,
+            'max': float(latencies.max()) if len(latencies) else 0.
+        })
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # requests of one connection are answered in order, concurrent requests use separate connections
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+
+                try:
+                    request = json.loads(line)
+                    if request.get('command') == 'metrics':
+                        response = self.metrics()
+                    else:
+                        response = await self.solve(request)
+                except (ValueError, AttributeError) as error:
+                    response = {'error': f'invalid request: {error}'}
+
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = 'localhost', port: int = 8765, path: str = None) -> None:
+        """
+        Serve requests until the task is cancelled.
+
+        :param host: host name of the TCP server
+        :param port: port of the TCP server
+        :param path: path of the Unix socket (if given, the server listens on it instead of TCP)
+        """
+
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+
+        async with server:
+            await server.serve_forever()
+
+    def close(self) -> None:
+        self.executor.shutdown(cancel_futures=True)
+
+
+async def send_request(message: Dict, host: str = 'localhost', port: int = 8765, path: str = None) -> Dict:
+    """
+    Local client - send one request to the server and wait for the answer.
+
+    :param message: request (see SolveServer)
+    :return: answer of the server
+    """
+
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+
+    try:
+        writer.write(json.dumps(message).encode() + b'\n')
+        await writer.drain()
+        return json.loads(await reader.readline())
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    add_bees_arguments(parser)
+    parser.add_argument('--time_limit', default=10., type=float, help='default time limit of the search for one request in seconds')
+    parser.add_argument('--max_time_limit', default=60., type=float, help='maximal time limit of the search which can be requested')
+    parser.add_argument('--workers', type=int, help='number of worker processes (default: number of processors)')
+    parser.add_argument('--seed', default=0, type=int, help='seed of the random numbers generators')
+    parser.add_argument('--network', required=True, type=str, help='name of the JSON file with shops and weights (start and list are ignored)')
+    parser.add_argument('--host', default='localhost', type=str, help='host name of the server')
+    parser.add_argument('--port', default=8765, type=int, help='port of the server')
+    parser.add_argument('--socket', type=str, help='path of the Unix socket (used instead of TCP if given)')
+    args = parser.parse_args()
+
+    solve_server = SolveServer(
+        ShopNetwork.from_json(args.network), args.workers, args.time_limit, args.max_time_limit, args.seed,
+        ns=args.ns, ne=args.ne, nb=args.nb, nre=args.nre, nrb=args.nrb, neighbourhood_size=args.d,
+        iters_without_improvement=args.improve_iters, max_iters=args.max_iters, temperature=args.temperature,
+        temp_decay=args.decay, evaluation=args.evaluation, neighbours=args.neighbours, improve=args.improve)
+
+    try:
+        asyncio.run(solve_server.serve(args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        solve_server.close()
@@ -0,0 +1,164 @@
+from typing import List
+
+import numpy as np
+
+
+# maximal number of elements of the matrices of candidate distances computed at once
+CHUNK_ELEMENTS = 2 ** 22
+
+
+class SpatialIndex:
+    """
+    Candidate lists of the nearest shops for every shop and for the start point (index 0), built once from
+    the shop coordinates. Shops are put into a uniform grid of square cells, with about k shops in cells
+    where most shops are, and the nearest shops of each node are searched in squares of cells around
+    its cell, for all nodes at once. Nodes for which a shop outside the square could be nearer are searched
+    again in twice as large squares. Time and memory grow linearly with the number of shops (times k),
+    unless most shops are crowded in a few points.
+    """
+
+    def __init__(self, positions: np.ndarray, index_shops: List[List[int]], k: int,
+                 chunk_elements: int = CHUNK_ELEMENTS, shop_neighbours: np.ndarray = None):
+        """
+        :param positions: positions of the start point (index 0) and all shops
+        :param index_shops: identifiers of shops that have in stock each product from the list
+        :param k: length of the candidate lists
+        :param chunk_elements: maximal number of elements of the matrices of distances computed at once
+        :param shop_neighbours: candidate lists of another index built for the same shops (the start point
+                                may differ), then only the candidate list of the start point is computed
+        """
+
+        self.positions = positions
+        self.k = min(k, len(positions) - 2)
+        self.index_shops = [np.array(shops, dtype=np.int64) for shops in index_shops]
+        self.neighbours = np.empty((len(positions), self.k), dtype=np.int64)
+
+        if self.k <= 0:
+            return
+
+        nodes = np.arange(len(positions))
+
+        # candidate lists of shops never contain the start point, so they do not depend on its position
+        if shop_neighbours is not None:
+            self.neighbours[1:] = shop_neighbours[1:]
+            nodes = nodes[:1]
+
+        self._x, self._y = np.ascontiguousarray(positions.T)
+        self._build_grid(positions[1:])
+        radius = 1
+
+        while len(nodes):
+            nodes = self._search(nodes, radius, chunk_elements)
+            radius *= 2
+
+    def _build_grid(self, shops: np.ndarray) -> None:
+        # shops are sorted by cells, shops of the cell c are self._order[self._starts[c]:self._starts[c + 1]]
+        self._low = shops.min(axis=0)
+        span = shops.max(axis=0) - self._low
+        n = len(shops)
+
+        # the first grid has k shops in each cell on average, then cells are scaled, so that the cell of the median
+        # shop has about k shops, but there are not many more cells than shops
+        self._cell_size = max(np.sqrt(span[0] * span[1] * self.k / n), span.max() / n) or 1.
+        self._shape = (span // self._cell_size).astype(np.int64) + 1
+        cells = self._cell_of(shops)
+        crowding = np.median(np.bincount(cells)[cells])
+        self._cell_size = max(self._cell_size * np.sqrt(self.k / (2 * crowding)),
+                              np.sqrt(span[0] * span[1] / (4 * n)), span.max() / (4 * n)) or 1.
+        self._shape = (span // self._cell_size).astype(np.int64) + 1
+
+        cells = self._cell_of(shops)
+        self._order = np.argsort(cells, kind='stable')
+        self._starts = np.searchsorted(cells[self._order], np.arange(self._shape.prod() + 1))
+
+    def _cell_of(self, points: np.ndarray) -> np.ndarray:
+        # points outside the grid (the start point) belong to the nearest cell
+        xy = np.clip(((points - self._low) // self._cell_size).astype(np.int64), 0, self._shape - 1)
+        return xy[:, 0] * self._shape[1] + xy[:, 1]
+
+    def _search(self, nodes: np.ndarray, radius: int, chunk_elements: int) -> np.ndarray:
+        # squares of cells around the nodes are given by ranges of columns and rows, shops of each column
+        # of the square are a contiguous range of self._order
+        width, height = self._shape.tolist()
+        points = self.positions[nodes]
+        x, y = np.divmod(self._cell_of(points), height)
+        x0, x1 = np.maximum(x - radius, 0), np.minimum(x + radius, width - 1)
+        y0, y1 = np.maximum(y - radius, 0), np.minimum(y + radius, height - 1)
+
+        columns = x0[:, np.newaxis] + np.arange(2 * radius + 1)
+        inside = columns <= x1[:, np.newaxis]
+        columns = np.minimum(columns, width - 1) * height
+        begins = self._starts[columns + y0[:, np.newaxis]]
+        counts = np.where(inside, self._starts[columns + y1[:, np.newaxis] + 1] - begins, 0)
+        totals = counts.sum(axis=1)
+
+        # shops outside the square are farther than its sides, sides on the border of the grid are not limits
+        low = self._low + np.column_stack((x0, y0)) * self._cell_size
+        high = self._low + np.column_stack((x1 + 1, y1 + 1)) * self._cell_size
+        margins = np.column_stack((points - low, high - points))
+        margins[np.column_stack((x0 == 0, y0 == 0, x1 == width - 1, y1 == height - 1))] = np.inf
+        margins = np.maximum(margins.min(axis=1), 0) ** 2
+
+        # nodes with similar numbers of shops in their squares are in the same chunks, so rows are padded less
+        order = np.argsort(totals, kind='stable')
+        nodes, counts, begins, totals, margins = (array[order] for array in (nodes, counts, begins, totals, margins))
+
+        not_found = []
+        first = 0
+
+        while first < len(nodes):
+            # rows of the chunk are nodes with at most twice as many shops in their squares as the first node,
+            # columns are these shops (padded with infinite distances)
+            limit = max(2 * int(totals[first]), self.k + 1)
+            last = min(int(np.searchsorted(totals, limit, 'right')), first + max(chunk_elements // limit, 1))
+            size = max(int(totals[last - 1]), self.k + 1)
+
+            lengths = counts[first:last].ravel()
+            shifts = np.repeat(begins[first:last].ravel() - (np.cumsum(lengths) - lengths), lengths)
+            shops = self._order[np.arange(lengths.sum()) + shifts] + 1
+            sources = np.repeat(nodes[first:last], totals[first:last])
+
+            # shops of each row are at its beginning, in the row-major order of the mask
+            filled = np.arange(size) < totals[first:last, np.newaxis]
+            candidates = np.zeros((last - first, size), dtype=np.int64)
+            candidates[filled] = shops
+            values = (self._x[sources] - self._x[shops]) ** 2 + (self._y[sources] - self._y[shops]) ** 2
+
+            # the node itself is never its own neighbour
+            values[sources == shops] = np.inf
+            distances = np.full((last - first, size), np.inf)
+            distances[filled] = values
+
+            nearest = np.argpartition(distances, self.k - 1, axis=1)[:, :self.k]
+            nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+            found = nearest_distances.max(axis=1) <= margins[first:last]
+
+            nearest = np.take_along_axis(nearest[found], np.argsort(nearest_distances[found], axis=1), axis=1)
+            self.neighbours[nodes[first:last][found]] = np.take_along_axis(candidates[found], nearest, axis=1)
+            not_found.append(nodes[first:last][~found])
+            first = last
+
+        return np.concatenate(not_found)
+
+    def nearest(self, node: int) -> np.ndarray:
+        """
+        :param node: identifier of the shop or 0 for the start point
+        :return: identifiers of the nearest shops sorted by distance
+        """
+
+        return self.neighbours[node]
+
+    def nearest_stocking(self, node: int, k: int, n: int) -> np.ndarray:
+        """
+        :param node: identifier of the shop or 0 for the start point
+        :param k: column index of the product in the stock matrix
+        :param n: maximal number of returned shops
+        :return: identifiers of at most n shops nearest to the node that have the product in stock
+        """
+
+        shops = self.index_shops[k]
+        if len(shops) <= n:
+            return shops
+
+        distances = ((self.positions[shops] - self.positions[node]) ** 2).sum(axis=1)
+        return shops[np.argpartition(distances, n - 1)[:n]]
@@ -0,0 +1,111 @@
+import csv
+import os
+from concurrent.futures import as_completed
+from typing import Dict, Iterable, List, Set, Tuple
+
+from bees_algorithm import bees_algorithm
+from problem_instance import ProblemInstance
+from worker_pool import call_shared, shared_pool
+
+COLUMNS = ['run', 'seed', 'ns', 'ne', 'nb', 'nre', 'nrb', 'd', 'improve_iters', 'max_iters',
+           'temperature', 'decay', 'cost', 'best_iter', 'iter_num']
+PARAMETERS = COLUMNS[2:12]
+
+
+def one_at_a_time_grid(defaults: Dict, tested: Dict[str, List], temperatures: List[float], runs: int,
+                       first_seed: int = 100) -> List[Tuple[int, int, Dict]]:
+    """
+    Declarative description of the parameter sweep: in every run and for every temperature each tested
+    parameter takes all of its values while other parameters keep their default values. Every job gets
+    its own seed, so its result does not depend on the order in which the jobs are run.
+
+    :param defaults: default values of all parameters from PARAMETERS
+    :param tested: values of tested parameters
+    :param temperatures: tested initial annealing temperatures
+    :param runs: number of repetitions of the whole sweep
+    :param first_seed: seed of the first job, next jobs get consecutive seeds
+    :return: list of jobs - run number, seed and values of the parameters
+    """
+
+    jobs = []
+    seed = first_seed
+
+    for run in range(1, runs + 1):
+        for temperature in temperatures:
+            for parameter, values in tested.items():
+                for value in values:
+                    jobs.append((run, seed, {**defaults, 'temperature': temperature, parameter: value}))
+                    seed += 1
+
+    return jobs
+
+
+def format_row(run: int, seed: int, params: Dict, results: Iterable = ()) -> List[str]:
+    return [str(value) for value in [run, seed, *(params[name] for name in PARAMETERS), *results]]
+
+
+def completed_jobs(filename: str) -> Set[Tuple[str, ...]]:
+    """
+    Read jobs already present in the results file, so a killed sweep can be resumed.
+
+    :param filename: name of the CSV file with results
+    :return: set of run numbers, seeds and parameter values of the completed jobs
+    """
+
+    if not os.path.exists(filename):
+        return set()
+
+    with open(filename, 'r', newline='') as file:
+        return {tuple(row[:len(PARAMETERS) + 2]) for row in csv.reader(file) if row and row[0] != COLUMNS[0]}
+
+
+def run_job(instance: ProblemInstance, run: int, seed: int, params: Dict) -> List[str]:
+    """
+    :param instance: compiled problem instance
+    :param run: run number
+    :param seed: seed of the bees algorithm
+    :param params: values of the parameters
+    :return: row of the results file
+    """
+
+    best_solution, best_iteration, iterations_num = bees_algorithm(
+        params['ns'], params['ne'], params['nb'], params['nre'], params['nrb'], instance, params['d'],
+        params['improve_iters'], params['max_iters'], params['temperature'], params['decay'], seed=seed)
+
+    return format_row(run, seed, params, [best_solution.cost, best_iteration, iterations_num])
+
+
+def run_sweep(jobs: List[Tuple[int, int, Dict]], test_data, filename: str, workers: int = None) -> None:
+    """
+    Run all jobs that are not yet present in the results file in parallel processes and append
+    every result to the file as soon as it is ready.
+
+    :param jobs: list of jobs - run number, seed and values of the parameters
+    :param test_data: dictionary with test data or compiled problem instance
+    :param filename: name of the CSV file with results
+    :param workers: number of worker processes (None means number of processors)
+    """
+
+    done = completed_jobs(filename)
+    jobs = [job for job in jobs if tuple(format_row(*job)) not in done]
+
+    if not os.path.exists(filename):
+        with open(filename, 'w+', newline='') as file:
+            csv.writer(file).writerow(COLUMNS)
+
+    print(f'{len(done)} jobs already done, {len(jobs)} jobs to run')
+
+    if not jobs:
+        return
+
+    instance = ProblemInstance.of(test_data)
+
+    with shared_pool(instance, workers) as executor, \
+            open(filename, 'a', newline='') as file:
+        writer = csv.writer(file)
+        futures = [executor.submit(call_shared, run_job, *job) for job in jobs]
+
+        for i, future in enumerate(as_completed(futures), 1):
+            writer.writerow(future.result())
+            file.flush()
+            print(f'{i}/{len(jobs)}')
@@ -0,0 +1,278 @@
+#!/usr/bin/python
+
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from typing import Callable, Dict, List
+
+import numpy.random
+
+import basic_solutions_generator
+from bees_algorithm import BeesColony, bees_algorithm, check_solution
+from exact_solver import solve_exact, use_exact
+from problem_instance import ProblemInstance
+from tests.tests_generator import generate_agglomeration_test, generate_city_test, generate_large_test
+
+GENERATORS = {
+    'large': generate_large_test,
+    'city': generate_city_test,
+    'agglomeration': generate_agglomeration_test
+}
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'results', 'benchmark_baseline.json')
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+# parameters of the bees algorithm used in benchmarks (default values from run.py)
+NS, NE, NB, NRE, NRB, D = 50, 20, 30, 5, 3, 6
+ITERATIONS = 20
+
+# modules on the import path of the solver and top-level packages which they must not load (plotting, test data)
+STARTUP_MODULES = ['run', 'bees_algorithm', 'basic_solutions_generator']
+FORBIDDEN_MODULES = ['matplotlib', 'tests']
+
+# generated instances small enough for the exact solver, on which the optimality gap is measured
+GAP_SHOPS, GAP_LIST_SIZE = 100, 10
+
+# allowed increase of the optimality gap relative to the baseline (the search is seeded, so gaps are repeatable)
+GAP_TOLERANCE = 0.01
+
+
+def measure(func: Callable, evaluations: int, min_time: float = 0.5) -> Dict:
+    """
+    Time the function and measure its peak memory usage.
+
+    :param func: benchmarked function
+    :param evaluations: number of evaluated solutions in one call of the function
+    :param min_time: the function is called repeatedly for at least this number of seconds
+    :return: dictionary with time of one call, evaluations per second and peak memory usage
+    """
+
+    calls = 0
+    start = time.perf_counter()
+
+    while calls == 0 or time.perf_counter() - start < min_time:
+        func()
+        calls += 1
+
+    seconds = (time.perf_counter() - start) / calls
+
+    # memory is measured in a separate call, because tracing slows the function down
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'seconds': seconds,
+        'evaluations_per_second': evaluations / seconds,
+        'peak_memory_mb': peak / 2 ** 20
+    }
+
+
+def benchmark_instance(test: str, size: int) -> Dict[str, Dict]:
+    """
+    Run all benchmarks on the generated instance.
+
+    :param test: type of the generated test (key of GENERATORS)
+    :param size: number of shops
+    :return: dictionary with results of each benchmark
+    """
+
+    numpy.random.seed(size)
+
+    # shopping list grows with the number of shops as in the default tests (100 products, 500 shops)
+    test_data = GENERATORS[test](shopping_list_size=max(size // 5, 1), number_of_shops=size)
+    results = {'compile': measure(lambda: ProblemInstance(test_data), 1)}
+
+    instance = ProblemInstance(test_data)
+    colony = BeesColony(NS, NE, NB, NRE, NRB, instance, D, temperature=0, seed=size)
+    colony.initialize()
+    patch = colony.patches[0]
+    route = patch.route.tolist()
+    shops_list = patch.items(instance)
+
+    results['generate'] = measure(lambda: basic_solutions_generator.generate(instance, NS, seed=size), NS)
+    results['calculate_cost'] = measure(lambda: basic_solutions_generator.calculate_cost(shops_list, instance), 1)
+    results['check_solution'] = measure(lambda: check_solution(route, instance), 1)
+    results['local_search'] = measure(lambda: colony.local_search(patch, NRE), NRE)
+
+    evaluations = ITERATIONS * (NE * NRE + (NB - NE) * NRB + NS - NB) + NS
+    results['bees_algorithm'] = measure(
+        lambda: bees_algorithm(NS, NE, NB, NRE, NRB, instance, D, ITERATIONS, ITERATIONS, 0, seed=size), evaluations)
+
+    return results
+
+
+def benchmark_gap(instance: ProblemInstance, seed: int) -> Dict:
+    """
+    Compare the solution of the bees algorithm with the optimal solution found by the exact solver.
+
+    :param instance: compiled problem instance
+    :param seed: seed of the bees algorithm
+    :return: dictionary with costs of both solutions, lower bound of the cost, whether the solution of the exact
+             solver is proven optimal and the relative gap between the cost of the bees algorithm and the lower bound
+    """
+
+    optimal_solution, lower_bound, optimal = solve_exact(instance)
+    solution, _, _ = bees_algorithm(NS, NE, NB, NRE, NRB, instance, D, ITERATIONS, ITERATIONS, 0, seed=seed)
+
+    return {
+        'cost': solution.cost,
+        'optimal_cost': optimal_solution.cost,
+        'lower_bound': lower_bound,
+        'optimal': optimal,
+        'gap': (solution.cost - lower_bound) / abs(lower_bound) if lower_bound else 0.
+    }
+
+
+def gap_instances(tests: List[str]) -> Dict[str, ProblemInstance]:
+    """
+    :param tests: types of generated tests (keys of GENERATORS)
+    :return: instances from tests/data and generated instances with GAP_SHOPS shops and GAP_LIST_SIZE products,
+             which are selected for the exact solver (see use_exact())
+    """
+
+    instances = {}
+
+    for filename in sorted(os.listdir(DATA_DIR)):
+        instances[os.path.splitext(filename)[0]] = ProblemInstance.from_json(os.path.join(DATA_DIR, filename))
+
+    for test in tests:
+        numpy.random.seed(GAP_SHOPS)
+        instances[f'{test}_{GAP_SHOPS}'] = ProblemInstance(GENERATORS[test](shopping_list_size=GAP_LIST_SIZE,
+                                                                            number_of_shops=GAP_SHOPS))
+
+    return {name: instance for name, instance in instances.items() if use_exact(instance)}
+
+
+def benchmark_startup(module: str, repeats: int = 5) -> Dict:
+    """
+    Measure the time of importing the module in a fresh interpreter.
+
+    :param module: name of the imported module
+    :param repeats: number of measurements, the shortest time is returned
+    :return: dictionary with time of the import and names of loaded modules from FORBIDDEN_MODULES
+    """
+
+    code = (f'import sys, time\n'
+            f'start = time.perf_counter()\n'
+            f'import {module}\n'
+            f'print(time.perf_counter() - start)\n'
+            f'print(*sorted(name for name in sys.modules if name.split(".")[0] in {FORBIDDEN_MODULES!r}))')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    times = []
+
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True,
+                                check=True).stdout.splitlines()
+        times.append(float(output[0]))
+
+    return {'seconds': min(times), 'forbidden_modules': output[1].split()}
+
+
+def compare_startup(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    :return: descriptions of imports that load forbidden modules or are slower than the baseline by more than
+             the tolerance
+    """
+
+    regressions = []
+
+    for module, result in results.items():
+        expected = baseline.get(module)
+
+        if result['forbidden_modules']:
+            regressions.append(f'import {module} loads {", ".join(result["forbidden_modules"])}')
+        if expected and result['seconds'] > expected['seconds'] * tolerance:
+            regressions.append(f'import {module}: {result["seconds"] * 1000:.1f} ms, '
+                               f'baseline {expected["seconds"] * 1000:.1f} ms')
+
+    return regressions
+
+
+def compare_gaps(results: Dict, baseline: Dict) -> List[str]:
+    """
+    :return: descriptions of instances on which the optimality gap is larger than in the baseline by more than
+             GAP_TOLERANCE
+    """
+
+    regressions = []
+
+    for name, result in results.items():
+        expected = baseline.get(name)
+
+        if expected and result['gap'] > expected['gap'] + GAP_TOLERANCE:
+            regressions.append(f'{name} optimality gap: {result["gap"] * 100:.2f}%, '
+                               f'baseline {expected["gap"] * 100:.2f}%')
+
+    return regressions
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    :return: descriptions of benchmarks that are slower than the baseline by more than the tolerance
+    """
+
+    regressions = []
+
+    for instance_name, benchmarks in results.items():
+        for name, result in benchmarks.items():
+            expected = baseline.get(instance_name, {}).get(name)
+
+            if expected and result['evaluations_per_second'] * tolerance < expected['evaluations_per_second']:
+                regressions.append(f'{instance_name} {name}: {result["evaluations_per_second"]:.1f} evaluations/s, '
+                                   f'baseline {expected["evaluations_per_second"]:.1f} evaluations/s')
+
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--tests', default=list(GENERATORS.keys()), nargs='+', choices=GENERATORS.keys(), help='types of generated tests')
+    parser.add_argument('--sizes', default=[50, 200, 500], nargs='+', type=int, help='numbers of shops in generated tests')
+    parser.add_argument('--baseline', default=BASELINE_FILE, type=str, help='name of the JSON file with baseline results')
+    parser.add_argument('--save', action='store_true', help='save results as the new baseline instead of comparing with it')
+    parser.add_argument('--tolerance', default=1.5, type=float, help='allowed slowdown relative to the baseline')
+    parser.add_argument('--startup_repeats', default=5, type=int, help='number of measurements of the import time of each module of the solver')
+    args = parser.parse_args()
+
+    startup_results = {module: benchmark_startup(module, args.startup_repeats) for module in STARTUP_MODULES}
+
+    for module, result in startup_results.items():
+        print(f'import {module:30} {result["seconds"] * 1000:10.3f} ms {" ".join(result["forbidden_modules"])}')
+
+    gap_results = {name: benchmark_gap(instance, GAP_SHOPS) for name, instance in gap_instances(args.tests).items()}
+
+    for name, result in gap_results.items():
+        print(f'{name:20} optimality gap {result["gap"] * 100:8.2f}% cost {result["cost"]:12.3f} '
+              f'optimal {result["optimal_cost"]:12.3f}{"" if result["optimal"] else " (not proven)"}')
+
+    all_results = {}
+
+    for test in args.tests:
+        for size in args.sizes:
+            name = f'{test}_{size}'
+            all_results[name] = benchmark_instance(test, size)
+
+            for benchmark, result in all_results[name].items():
+                print(f'{name:20} {benchmark:16} {result["seconds"] * 1000:10.3f} ms '
+                      f'{result["evaluations_per_second"]:12.1f} evaluations/s {result["peak_memory_mb"]:8.2f} MB')
+
+    if args.save:
+        with open(args.baseline, 'w+') as file:
+            json.dump(dict(all_results, startup=startup_results, optimality_gap=gap_results), file, indent=2)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as file:
+            baseline_results = json.load(file)
+
+        regressions = compare_startup(startup_results, baseline_results.get('startup', {}), args.tolerance)
+        regressions += compare_gaps(gap_results, baseline_results.get('optimality_gap', {}))
+        regressions += compare(all_results, baseline_results, args.tolerance)
+
+        if regressions:
+            print('Performance regressions:', *regressions, sep='\n')
+            sys.exit(1)
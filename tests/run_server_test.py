@@ -0,0 +1,137 @@
+#!/usr/bin/python
+
+import asyncio
+import json
+import socket
+from argparse import ArgumentParser
+from typing import Dict, List
+
+import numpy as np
+
+from shop_network import ShopNetwork
+from solve_server import SolveServer, send_request
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+def check_reply(network: ShopNetwork, request: Dict, reply: Dict) -> List[str]:
+    """
+    :param network: network of shops
+    :param request: request sent to the server
+    :param reply: answer of the server
+    :return: list of problems found in the answer (empty if the answer is correct)
+    """
+
+    if 'error' in reply:
+        return [f'request {request.get("id")}: {reply["error"]}']
+
+    problems = []
+    if reply.get('id') != request.get('id'):
+        problems.append(f'request {request.get("id")}: answer has id {reply.get("id")}')
+
+    bought = []
+    for shop, items in reply['solution']:
+        bought += items
+        for item in items:
+            if shop not in network.item_shops[item]:
+                problems.append(f'request {request["id"]}: product {item} is not available in shop {shop}')
+
+    if sorted(bought) != sorted(set(request['list'])):
+        problems.append(f'request {request["id"]}: bought products {sorted(bought)} instead of {request["list"]}')
+
+    route = [shop for shop, _ in reply['solution']]
+    cost = network.instance(request['start'], request['list']).route_cost(route)
+    if not np.isclose(cost, reply['cost']):
+        problems.append(f'request {request["id"]}: cost {reply["cost"]} of the route {route} is {cost}')
+
+    return problems
+
+
+async def run_test(server: SolveServer, network: ShopNetwork, port: int, requests_num: int) -> List[str]:
+    """
+    Start the server on localhost, send identical requests at the same time (they should be solved once)
+    and different concurrent requests, and check the answers.
+
+    :return: list of problems found in the answers
+    """
+
+    serving = asyncio.create_task(server.serve('localhost', port))
+    problems = []
+
+    try:
+        # wait until the server accepts connections
+        while True:
+            try:
+                await send_request({'command': 'metrics'}, port=port)
+                break
+            except OSError:
+                await asyncio.sleep(0.1)
+
+        products = sorted(network.item_shops)
+        rng = np.random.default_rng(0)
+
+        def request(i: int) -> Dict:
+            items = rng.choice(products, size=min(len(products), 8), replace=False)
+            return {'id': i, 'start': {'x': float(rng.uniform(-100, 100)), 'y': float(rng.uniform(-100, 100))},
+                    'list': [int(item) for item in items]}
+
+        # identical requests differing only in the id
+        same = request(0)
+        coalesced = [dict(same, id=i) for i in range(4)]
+        replies = await asyncio.gather(*(send_request(r, port=port) for r in coalesced))
+
+        for r, reply in zip(coalesced, replies):
+            problems += check_reply(network, r, reply)
+        if len({json.dumps(reply['solution']) for reply in replies if 'solution' in reply}) > 1:
+            problems.append('identical requests got different solutions')
+
+        metrics = await send_request({'command': 'metrics'}, port=port)
+        if metrics['solved'] != 1 or metrics['coalesced'] != len(coalesced) - 1:
+            problems.append(f'identical requests were not coalesced: {metrics}')
+
+        # different requests sent at the same time
+        concurrent = [request(i) for i in range(1, requests_num + 1)]
+        replies = await asyncio.gather(*(send_request(r, port=port) for r in concurrent))
+
+        for r, reply in zip(concurrent, replies):
+            problems += check_reply(network, r, reply)
+
+        reply = await send_request({'id': 'invalid', 'start': {'x': 0, 'y': 0}, 'list': [-1]}, port=port)
+        if 'error' not in reply or reply.get('id') != 'invalid':
+            problems.append(f'request with unknown product was answered with {reply}')
+
+        metrics = await send_request({'command': 'metrics'}, port=port)
+        print(f'Metrics: {metrics}')
+        if metrics['requests'] != len(coalesced) + len(concurrent) + 1 or metrics['in_flight'] != 0:
+            problems.append(f'wrong numbers of requests: {metrics}')
+    finally:
+        serving.cancel()
+        await asyncio.gather(serving, return_exceptions=True)
+
+    return problems
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--network', default='tests/data/three_cities.json', type=str, help='name of the JSON file with shops and weights')
+    parser.add_argument('--requests', default=20, type=int, help='number of concurrent requests')
+    parser.add_argument('--workers', default=2, type=int, help='number of worker processes')
+    args = parser.parse_args()
+
+    shop_network = ShopNetwork.from_json(args.network)
+    solve_server = SolveServer(shop_network, args.workers, time_limit=5., ns=20, ne=5, nb=10, nre=3, nrb=2,
+                               neighbourhood_size=3, iters_without_improvement=20, max_iters=50)
+
+    try:
+        found = asyncio.run(run_test(solve_server, shop_network, free_port(), args.requests))
+    finally:
+        solve_server.close()
+
+    for problem in found:
+        print(problem)
+    print('OK' if not found else f'{len(found)} problems found')
+    exit(1 if found else 0)
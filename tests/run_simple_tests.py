@@ -1,7 +1,6 @@
 #!/usr/bin/python
 
 import os
-import random
 
 import simple_tests_data
 from basic_solutions_generator import generate
@@ -14,8 +13,6 @@ def main() -> None:
     generates 10 sample solutions for each test and saves them in "solutions/test_name" folder.
     """
 
-    random.seed(42)
-
     all_tests = [
         ('circle', simple_tests_data.circle),
         ('normal2d', simple_tests_data.normal2d),
@@ -29,7 +26,7 @@ def main() -> None:
         test = generate_test(test)
         save_as_json(test, f'data/{name}.json')
 
-        solutions = generate(test, 10)
+        solutions = generate(test, 10, seed=42)
         os.makedirs(f'solutions/{name}', exist_ok=True)
 
         for i, solution in enumerate(solutions, 1):
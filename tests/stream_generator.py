@@ -0,0 +1,227 @@
+import json
+from argparse import ArgumentParser
+from typing import Callable, Dict, Iterator, NamedTuple, Tuple
+
+import numpy as np
+
+from instance_io import MAGIC, VERSION, align
+from weights import HashNoiseWeights
+
+CITY_RADIUS, CITY_MAX_Q = 100, 100
+AGGLOMERATION_RADIUS = 20
+AGGLOMERATION_CENTRES = np.array([[-100, -100], [-100, 100], [100, -100], [100, 100]])
+
+# bytes reserved in the header of the binary file for the number of inventory entries, which is known at the end
+HEADER_RESERVE = 32
+
+
+class TestType(NamedTuple):
+    """
+    Distributions of the generated test (the same as in tests_generator.py): the start point, positions
+    and queue costs of the given shops, and the scale of weights.
+    """
+
+    start: Callable[[np.random.Generator], np.ndarray]
+    shops: Callable[[np.random.Generator, np.ndarray, int], Tuple[np.ndarray, np.ndarray, np.ndarray]]
+    weights_scale: float
+
+
+def _large_shops(rng: np.random.Generator, ids: np.ndarray, n_shops: int) -> Tuple:
+    x, y = rng.uniform(0, 100, (2, len(ids)))
+    return x, y, rng.normal(20, 5, len(ids))
+
+
+def _city_shops(rng: np.random.Generator, ids: np.ndarray, n_shops: int) -> Tuple:
+    x, y = rng.normal(0, CITY_RADIUS, (2, len(ids)))
+    return x, y, np.maximum(0, -CITY_MAX_Q * np.hypot(x, y) / (3 * CITY_RADIUS) + CITY_MAX_Q)
+
+
+def _agglomeration_shops(rng: np.random.Generator, ids: np.ndarray, n_shops: int) -> Tuple:
+    cluster = np.minimum(ids // max(n_shops // 4, 1), 3)
+    x, y = (AGGLOMERATION_CENTRES[cluster] + rng.normal(0, AGGLOMERATION_RADIUS, (len(ids), 2))).T
+    return x, y, np.zeros(len(ids))
+
+
+TESTS = {
+    'large': TestType(lambda rng: rng.normal(50, 10, 2), _large_shops, 0.05),
+    'city': TestType(lambda rng: rng.normal(0, CITY_RADIUS, 2), _city_shops, 0.5),
+    'agglomeration': TestType(lambda rng: np.zeros(2), _agglomeration_shops, 0.05)
+}
+
+
+def shop_chunks(test: str, number_of_shops: int, shopping_list_size: int, rng: np.random.Generator,
+                chunk_size: int = 10000) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Draw shops of the generated test in chunks, each chunk with a few bulk NumPy calls. Every shop has
+    1-3 random products and, so that every product is in stock in some shop without drawing shops again,
+    the shop covering each product of the list is drawn before all shops.
+
+    :param test: type of the generated test (key of TESTS)
+    :param number_of_shops: number of shops
+    :param shopping_list_size: number of products, the list contains products 1, ..., shopping_list_size
+    :param rng: random numbers generator
+    :param chunk_size: number of shops in one chunk
+    :return: generator of chunks with identifiers, positions, queue costs and inventories of shops
+             (products of the i-th shop of the chunk are items[indptr[i]:indptr[i + 1]])
+    """
+
+    covering = rng.integers(1, number_of_shops + 1, shopping_list_size)
+    products = np.argsort(covering, kind='stable') + 1
+    covering = covering[products - 1]
+    m = shopping_list_size + 1
+
+    for first in range(1, number_of_shops + 1, chunk_size):
+        ids = np.arange(first, min(first + chunk_size, number_of_shops + 1))
+        x, y, q = TESTS[test].shops(rng, ids, number_of_shops)
+        counts = rng.integers(1, 3 + 1, len(ids))
+
+        covered = slice(*np.searchsorted(covering, [ids[0], ids[-1] + 1]))
+        shops = np.concatenate((np.repeat(ids, counts), covering[covered]))
+        items = np.concatenate((rng.integers(1, m, counts.sum()), products[covered]))
+
+        # duplicated products of a shop are removed and products are sorted by shops
+        shops, items = np.divmod(np.unique(shops * m + items), m)
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(shops - first, minlength=len(ids)))))
+
+        yield {'ids': ids, 'x': x, 'y': y, 'q': q, 'indptr': indptr, 'items': items}
+
+
+def write_json(filename: str, test: str, number_of_shops: int, shopping_list_size: int = 100, seed: int = 0,
+               chunk_size: int = 10000) -> None:
+    """
+    Generate the test and write it to the JSON file chunk by chunk, so only one chunk of shops is kept
+    in memory. Weights are saved as the compact description of HashNoiseWeights.
+
+    :param filename: name of the JSON file
+    :param test: type of the generated test (key of TESTS)
+    :param number_of_shops: number of shops
+    :param shopping_list_size: number of products on the list
+    :param seed: seed of the random numbers generator (the same seed and chunk size give the same test)
+    :param chunk_size: number of shops in one chunk
+    """
+
+    rng = np.random.default_rng(seed)
+    x, y = TESTS[test].start(rng)
+    weights = HashNoiseWeights(int(rng.integers(2 ** 31)), 1, TESTS[test].weights_scale)
+    header = {'start': {'x': float(x), 'y': float(y)}, 'list': list(range(1, shopping_list_size + 1)),
+              'weights': weights.to_dict()}
+
+    with open(filename, 'w+') as file:
+        file.write(json.dumps(header)[:-1] + ', "shops": [\n')
+        separator = ''
+
+        for chunk in shop_chunks(test, number_of_shops, shopping_list_size, rng, chunk_size):
+            inventories = np.split(chunk['items'], chunk['indptr'][1:-1])
+
+            for shop_id, shop_x, shop_y, q, items in zip(chunk['ids'].tolist(), chunk['x'].tolist(),
+                                                         chunk['y'].tolist(), chunk['q'].tolist(), inventories):
+                shop = {'id': shop_id, 'q': q, 'x': shop_x, 'y': shop_y, 'items': items.tolist()}
+                file.write(separator + json.dumps(shop))
+                separator = ',\n'
+
+        file.write('\n]}\n')
+
+
+def write_binary(filename: str, test: str, number_of_shops: int, shopping_list_size: int = 100, seed: int = 0,
+                 chunk_size: int = 10000, dense_weights: bool = False) -> None:
+    """
+    Generate the test and write it to the binary file (see instance_io.py) chunk by chunk, so only one chunk
+    of shops or weights is kept in memory. The cost matrix is not stored.
+
+    :param filename: name of the binary file
+    :param test: type of the generated test (key of TESTS)
+    :param number_of_shops: number of shops
+    :param shopping_list_size: number of products on the list
+    :param seed: seed of the random numbers generator (the same seed and chunk size give the same test)
+    :param chunk_size: number of shops (or rows of weights) in one chunk
+    :param dense_weights: if True, weights of all roads are drawn and stored as the upper triangle of the matrix
+                          (its size grows with the square of the number of shops), otherwise the description
+                          of HashNoiseWeights is stored in the header
+    """
+
+    rng = np.random.default_rng(seed)
+    start = TESTS[test].start(rng)
+    weights_seed = int(rng.integers(2 ** 31))
+    size = number_of_shops + 1
+
+    arrays = {
+        'positions': (np.float64, [size, 2]),
+        'q': (np.float64, [size]),
+        'items': (np.int64, [shopping_list_size]),
+        'inventory_indptr': (np.int64, [size + 1])
+    }
+
+    if dense_weights:
+        arrays['weights'] = (np.float64, [size * (size - 1) // 2])
+
+    # the number of inventory entries is known after all shops are drawn, so the array is the last one
+    arrays['inventory_indices'] = (np.int64, [0])
+
+    header = {'version': VERSION, 'n_shops': number_of_shops, 'arrays': {}}
+    offset = 0
+
+    for name, (dtype, shape) in arrays.items():
+        header['arrays'][name] = {'dtype': np.dtype(dtype).str, 'shape': shape, 'offset': offset}
+        offset = align(offset + np.dtype(dtype).itemsize * int(np.prod(shape)))
+
+    if not dense_weights:
+        header['weights_model'] = HashNoiseWeights(weights_seed, 1, TESTS[test].weights_scale).to_dict()
+
+    header_length = len(json.dumps(header)) + HEADER_RESERVE
+    data_start = align(len(MAGIC) + 8 + header_length)
+
+    def write(name: str, position: int, array: np.ndarray) -> None:
+        file.seek(data_start + header['arrays'][name]['offset'] + position * array.itemsize)
+        file.write(np.ascontiguousarray(array, dtype=arrays[name][0]).tobytes())
+
+    with open(filename, 'wb') as file:
+        write('positions', 0, start)
+        write('q', 0, np.zeros(1))
+        write('items', 0, np.arange(1, shopping_list_size + 1))
+        write('inventory_indptr', 0, np.zeros(2))
+
+        entries = 0
+
+        for chunk in shop_chunks(test, number_of_shops, shopping_list_size, rng, chunk_size):
+            first = int(chunk['ids'][0])
+            write('positions', 2 * first, np.column_stack((chunk['x'], chunk['y'])))
+            write('q', first, chunk['q'])
+            write('inventory_indptr', first + 1, entries + chunk['indptr'][1:])
+            write('inventory_indices', entries, chunk['items'] - 1)
+            entries += len(chunk['items'])
+
+        # rows of the upper triangle are drawn in chunks, the i-th row has weights of roads from i to i + 1, ...
+        if dense_weights:
+            written = 0
+
+            for first in range(0, size, chunk_size):
+                lengths = size - 1 - np.arange(first, min(first + chunk_size, size))
+                values = rng.normal(1, TESTS[test].weights_scale, lengths.sum())
+                write('weights', written, values)
+                written += len(values)
+
+        header['arrays']['inventory_indices']['shape'] = [entries]
+
+        file.seek(0)
+        file.write(MAGIC)
+        file.write(header_length.to_bytes(8, 'little'))
+        file.write(json.dumps(header).ljust(header_length).encode())
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('output', type=str, help='name of the output file (.json for JSON, binary format otherwise)')
+    parser.add_argument('--test', default='large', choices=TESTS.keys(), help='type of the generated test')
+    parser.add_argument('--shops', default=100000, type=int, help='number of shops')
+    parser.add_argument('--list', default=100, type=int, help='number of products on the shopping list')
+    parser.add_argument('--seed', default=0, type=int, help='seed of the random numbers generator')
+    parser.add_argument('--chunk_size', default=10000, type=int, help='number of shops generated and written at once')
+    parser.add_argument('--dense_weights', action='store_true', help='store weights of all roads (binary format only, size grows with the square of the number of shops)')
+    args = parser.parse_args()
+
+    if args.output.endswith('.json'):
+        if args.dense_weights:
+            parser.error('dense weights can be stored only in the binary format')
+        write_json(args.output, args.test, args.shops, args.list, args.seed, args.chunk_size)
+    else:
+        write_binary(args.output, args.test, args.shops, args.list, args.seed, args.chunk_size, args.dense_weights)
@@ -0,0 +1,279 @@
+import itertools
+import json
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from bees_algorithm import BeesColony, bees_algorithm
+from delta_evaluation import RouteEvaluator
+from exact_solver import solve_exact
+from instance_io import load_binary, save_binary
+from problem_instance import DENSE_COST_LIMIT, ProblemInstance
+from route_improvement import improve_route
+from shop_network import ShopNetwork
+from spatial_index import SpatialIndex
+from weights import HashNoiseWeights
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+DATA_FILES = sorted(os.listdir(DATA_DIR))
+
+
+def load_data(name: str) -> dict:
+    with open(os.path.join(DATA_DIR, name), 'r') as file:
+        return json.load(file)
+
+
+def random_instance(seed: int, n_shops: int, n_items: int, weights: str = 'dense') -> ProblemInstance:
+    """
+    :param seed: seed of the random numbers generator
+    :param n_shops: number of shops
+    :param n_items: number of products on the list
+    :param weights: 'dense' - asymmetric weight matrix, 'triangle' - upper triangle of symmetric weights,
+                    'model' - implicit weight model
+    :return: compiled problem instance in which every product is available in some shop
+    """
+
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(0, 100, (n_shops + 1, 2))
+    q = np.concatenate(([0.], rng.uniform(0, 5, n_shops)))
+    stock = rng.random((n_shops + 1, n_items)) < 0.3
+    stock[0] = False
+    stock[rng.integers(1, n_shops + 1, n_items), np.arange(n_items)] = True
+
+    if weights == 'dense':
+        weights = rng.uniform(0.5, 1.5, (n_shops + 1, n_shops + 1))
+    elif weights == 'triangle':
+        weights = rng.uniform(0.5, 1.5, n_shops * (n_shops + 1) // 2)
+    else:
+        weights = HashNoiseWeights(seed, 1, 0.05)
+
+    return ProblemInstance.from_arrays(positions, q, np.arange(1, n_items + 1), stock, weights)
+
+
+def network_instance(seed: int) -> ProblemInstance:
+    # instance of one customer created from the network of shops (shared cost matrix with the start point
+    # calculated for the customer)
+    data = load_data('three_cities.json')
+    rng = np.random.default_rng(seed)
+    start = {'x': float(rng.uniform(0, 100)), 'y': float(rng.uniform(0, 100))}
+    return ShopNetwork(data).instance(start, data['list'])
+
+
+def brute_force_cost(instance: ProblemInstance) -> float:
+    best = float('inf')
+    shops = range(1, instance.n_shops + 1)
+
+    for length in range(1, instance.n_shops + 1):
+        for route in itertools.permutations(shops, length):
+            mask = 0
+            for shop in route:
+                mask |= instance.shop_masks[shop]
+            if mask == instance.full_mask:
+                best = min(best, instance.route_cost(route))
+
+    return best
+
+
+@pytest.mark.parametrize('instance', [
+    random_instance(1, 30, 6),
+    random_instance(2, 30, 6, 'triangle'),
+    random_instance(3, DENSE_COST_LIMIT + 10, 6, 'model'),
+    network_instance(4)
+], ids=['dense', 'triangle', 'lazy', 'network'])
+def test_delta_cost_equals_full_cost(instance):
+    rng = np.random.default_rng(0)
+    route = RouteEvaluator(instance, rng.permutation(np.arange(1, instance.n_shops + 1))[:5].tolist())
+
+    for _ in range(500):
+        move = rng.integers(4) if len(route) > 2 else 0
+        outside = [shop for shop in rng.integers(1, instance.n_shops + 1, 10).tolist() if shop not in route]
+
+        if move == 0 and outside:
+            route.insert(int(rng.integers(len(route) + 1)), outside[0])
+        elif move == 1:
+            route.remove(int(rng.integers(len(route))))
+        elif move == 2 and outside:
+            route.substitute(int(rng.integers(len(route))), outside[0])
+        elif move == 3:
+            route.swap(*rng.integers(len(route), size=2).tolist())
+
+        assert route.cost == pytest.approx(instance.route_cost(route.route), rel=1e-9, abs=1e-9)
+
+
+@pytest.mark.parametrize('cost_matrix', [True, False])
+@pytest.mark.parametrize('mmap', [True, False])
+@pytest.mark.parametrize('instance', [
+    ProblemInstance(load_data('three_cities.json')),
+    random_instance(5, 40, 8),
+    random_instance(6, 40, 8, 'triangle'),
+    random_instance(7, 40, 8, 'model')
+], ids=['json', 'dense', 'triangle', 'model'])
+def test_binary_round_trip(tmp_path, instance, mmap, cost_matrix):
+    filename = str(tmp_path / 'instance.bin')
+    save_binary(instance, filename, cost_matrix)
+    loaded = load_binary(filename, mmap)
+
+    assert loaded.n_shops == instance.n_shops
+    assert loaded.item_list == instance.item_list
+    assert loaded.shop_masks == instance.shop_masks
+    np.testing.assert_array_equal(loaded.positions, instance.positions)
+    np.testing.assert_array_equal(loaded.q, instance.q)
+    np.testing.assert_array_equal(loaded.stock, instance.stock)
+
+    nodes = np.arange(instance.n_shops + 1)
+    np.testing.assert_allclose(loaded.cost_matrix[nodes[:, np.newaxis], nodes],
+                               instance.cost_matrix[nodes[:, np.newaxis], nodes], rtol=1e-12)
+
+    # instances loaded from the file are sent to other processes as the name of the file
+    copy = pickle.loads(pickle.dumps(loaded))
+    assert copy.source_file == loaded.source_file
+    assert copy.route_cost([1, 2, 3]) == loaded.route_cost([1, 2, 3])
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_exact_solver_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    instance = random_instance(seed, int(rng.integers(3, 8)), int(rng.integers(1, 6)))
+
+    solution, lower_bound, optimal = solve_exact(instance)
+    best = brute_force_cost(instance)
+
+    assert optimal
+    assert solution.cost == pytest.approx(best, abs=1e-9)
+    assert solution.cost == pytest.approx(instance.route_cost(solution.route), abs=1e-9)
+    assert lower_bound <= best + 1e-9
+    assert len(set(solution.route)) == len(solution.route)
+
+
+def test_truncated_exact_solver_is_not_reported_optimal():
+    for seed in range(100):
+        instance = random_instance(seed, 7, 4)
+        solution, lower_bound, optimal = solve_exact(instance, max_nodes=1)
+
+        if optimal:
+            assert solution.cost == pytest.approx(solve_exact(instance)[0].cost, abs=1e-9)
+        else:
+            assert lower_bound < solution.cost
+
+
+@pytest.mark.parametrize('evaluation', ['delta', 'batch'])
+@pytest.mark.parametrize('neighbours', [0, 5])
+def test_seeded_bees_algorithm_is_reproducible(evaluation, neighbours):
+    instance = ProblemInstance(load_data('two_cities_with_valley.json'))
+    results = [bees_algorithm(10, 3, 5, 3, 2, instance, 3, max_iters=30, evaluation=evaluation,
+                              neighbours=neighbours, seed=7) for _ in range(2)]
+
+    (first, first_iteration, first_iterations), (second, second_iteration, second_iterations) = results
+    assert first.route == second.route
+    assert first.cost == second.cost
+    assert (first_iteration, first_iterations) == (second_iteration, second_iterations)
+
+
+@pytest.mark.parametrize('name', DATA_FILES)
+def test_bees_algorithm_finds_feasible_solutions(name):
+    instance = ProblemInstance(load_data(name))
+    solution, _, _ = bees_algorithm(10, 3, 5, 3, 2, instance, 3, max_iters=20, seed=0)
+
+    bought = [item for _, items in solution.items(instance) for item in items]
+    assert sorted(bought) == sorted(instance.item_list)
+    assert solution.cost == pytest.approx(instance.route_cost(solution.route))
+
+
+def test_repeated_products_are_bought_once():
+    data = load_data('three_cities.json')
+    repeated = dict(data, list=data['list'] + data['list'][:3])
+
+    assert ProblemInstance(repeated).item_list == ProblemInstance(data).item_list
+    assert solve_exact(repeated)[0].cost == solve_exact(data)[0].cost
+
+
+def test_immigrant_better_than_the_best_solution_updates_the_best_iteration():
+    instance = random_instance(8, 30, 6)
+    colony = BeesColony(5, 1, 2, 2, 1, instance, 2, temperature=0, seed=1)
+    colony.attach(instance)
+    colony.initialize()
+    for _ in colony.run(3):
+        pass
+
+    optimal_solution, _, _ = solve_exact(instance)
+    assert optimal_solution.cost < colony.best_solution.cost
+
+    colony.immigrate([optimal_solution])
+    assert colony.result() == (optimal_solution, 3, 3)
+
+
+@pytest.mark.parametrize('layout', ['uniform', 'clustered', 'line'])
+@pytest.mark.parametrize('k', [1, 5, 30])
+def test_spatial_index_finds_nearest_shops(layout, k):
+    rng = np.random.default_rng(k)
+    n_shops = 500
+
+    if layout == 'uniform':
+        positions = rng.uniform(0, 100, (n_shops + 1, 2))
+    elif layout == 'clustered':
+        centres = rng.uniform(0, 1000, (5, 2))
+        positions = centres[rng.integers(5, size=n_shops + 1)] + rng.normal(0, 1, (n_shops + 1, 2))
+    else:
+        positions = np.column_stack((rng.uniform(0, 100, n_shops + 1), np.zeros(n_shops + 1)))
+
+    # the start point outside the area of shops
+    positions[0] = (-500, 300)
+    index = SpatialIndex(positions, [], k, chunk_elements=1000)
+
+    distances = ((positions[:, np.newaxis] - positions[np.newaxis, 1:]) ** 2).sum(axis=2)
+    distances[np.arange(1, n_shops + 1), np.arange(n_shops)] = np.inf
+    expected = np.sort(distances, axis=1)[:, :k]
+
+    # shops at equal distances may be listed in any order, so distances are compared
+    found = distances[np.arange(n_shops + 1)[:, np.newaxis], index.neighbours - 1]
+    np.testing.assert_allclose(found, expected)
+    assert all(node not in neighbours for node, neighbours in enumerate(index.neighbours.tolist()))
+
+    moved = positions.copy()
+    moved[0] = rng.uniform(0, 100, 2)
+    reused = SpatialIndex(moved, [], k, shop_neighbours=index.neighbours)
+    np.testing.assert_array_equal(reused.neighbours[1:], index.neighbours[1:])
+    np.testing.assert_allclose(((moved[reused.neighbours[0]] - moved[0]) ** 2).sum(axis=1),
+                               np.sort(((moved[1:] - moved[0]) ** 2).sum(axis=1))[:k])
+
+
+@pytest.mark.parametrize('neighbours', [0, 3, 8])
+@pytest.mark.parametrize('seed', range(10))
+def test_route_improvement_never_increases_cost(seed, neighbours):
+    instance = random_instance(seed, 30, 6)
+    rng = np.random.default_rng(seed)
+    route = rng.permutation(np.arange(1, instance.n_shops + 1))[:int(rng.integers(2, 15))].tolist()
+
+    # the moves are deterministic, so each result continues the previous one with one more move
+    costs = [instance.route_cost(route)]
+    for moves in range(1, 20):
+        improved = improve_route(instance, route, moves, neighbours).tolist()
+        assert sorted(improved) == sorted(route)
+        costs.append(instance.route_cost(improved))
+
+    assert all(cost <= previous + 1e-9 for previous, cost in zip(costs, costs[1:]))
+
+
+@pytest.mark.parametrize('evaluation', ['delta', 'batch'])
+def test_search_resumed_from_checkpoint_equals_uninterrupted_search(tmp_path, evaluation):
+    # the best solution of both evaluations is found after the interruption
+    instance = random_instance(0, 60, 10)
+    checkpoint = str(tmp_path / 'checkpoint.json')
+
+    def search(max_iters: int, **kwargs):
+        return bees_algorithm(10, 3, 5, 3, 2, instance, 3, iters_without_improvement=1000, max_iters=max_iters,
+                              evaluation=evaluation, seed=3, **kwargs)
+
+    uninterrupted = search(30)
+
+    # the first search is stopped by the callback between checkpoints, the last state is saved at the end
+    search(30, checkpoint=checkpoint, checkpoint_interval=5, callback=lambda progress: progress.iteration < 12)
+    with open(checkpoint, 'r') as file:
+        assert json.load(file)['iterations_num'] == 12
+
+    solution, best_iteration, iterations_num = search(30, checkpoint=checkpoint, checkpoint_interval=5)
+    assert solution.route.tolist() == uninterrupted[0].route.tolist()
+    assert solution.cost == uninterrupted[0].cost
+    assert (best_iteration, iterations_num) == uninterrupted[1:]
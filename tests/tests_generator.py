@@ -1,7 +1,8 @@
 import json
-from matplotlib import pyplot as plt
 import numpy as np
-import pickle
+
+from instance_io import load_binary, save_binary
+from weights import HashNoiseWeights
 
 
 def save_as_json(test, test_name):
@@ -9,30 +10,6 @@ def save_as_json(test, test_name):
         json.dump(test, file)
 
 
-def plot_shops(wrapper, result=None):
-    xss = [wrapper.x_start]
-    yss = [wrapper.y_start]
-    plt.scatter(xss, yss, c="red")
-    plt.annotate(0, (xss[0], yss[0]))
-    xs, ys = zip(*wrapper.shops_pos)
-    plt.scatter(xs, ys, c="blue")
-    for i in range(1, len(xs) + 1):
-        plt.annotate(i, (xs[i - 1], ys[i - 1]))
-    if result is not None:
-        chosen_shops_x = [wrapper.x_start]
-        chosen_shops_y = [wrapper.y_start]
-
-        for elem in result["solution"]:
-            chosen_shops_x.append(xs[elem[0] - 1])
-            chosen_shops_y.append(ys[elem[0] - 1])
-
-        chosen_shops_x.append(wrapper.x_start)
-        chosen_shops_y.append(wrapper.y_start)
-
-        plt.plot(chosen_shops_x, chosen_shops_y)
-    plt.show()
-
-
 def generate_test(wrapper):
     """
     Function for wrapped data generates a python dict which then is passed to the save_as_json function
@@ -64,7 +41,7 @@ def generate_test(wrapper):
     return res
 
 
-def generate_large_test(shopping_list_size=100, number_of_shops=500):
+def generate_large_test(shopping_list_size=100, number_of_shops=500, compact_weights=False):
     res = {}
     shopping_list = [i for i in range(1, shopping_list_size + 1)]
     start = {"x": np.random.normal(50, 10), "y": np.random.normal(50, 10)}
@@ -80,8 +57,14 @@ def generate_large_test(shopping_list_size=100, number_of_shops=500):
                      "items": items}
         shops.append(shop_dict)
     if not set(check).issuperset(set(shopping_list)):
-        return generate_large_test(shopping_list_size, number_of_shops)
+        return generate_large_test(shopping_list_size, number_of_shops, compact_weights)
     res["shops"] = shops
+
+    # weights computed on demand from the seed instead of the dictionary with all pairs of shops
+    if compact_weights:
+        res["weights"] = HashNoiseWeights(np.random.randint(2 ** 31), 1, 0.05).to_dict()
+        return res
+
     weights_dict = {f"{idx}": {} for idx in range(0, len(shops) + 1)}
     k = 0
     for i in range(0, len(shops) + 1):
@@ -94,7 +77,8 @@ def generate_large_test(shopping_list_size=100, number_of_shops=500):
     return res
 
 
-def generate_city_test(shopping_list_size=100, number_of_shops=500, radius=100, max_q=100, weights_scale=0.5):
+def generate_city_test(shopping_list_size=100, number_of_shops=500, radius=100, max_q=100, weights_scale=0.5,
+                       compact_weights=False):
     res = {}
     shopping_list = [i for i in range(1, shopping_list_size + 1)]
     start = {"x": np.random.normal(0, radius), "y": np.random.normal(0, radius)}
@@ -114,9 +98,15 @@ def generate_city_test(shopping_list_size=100, number_of_shops=500, radius=100,
         shops.append(shop_dict)
 
     if not set(check).issuperset(set(shopping_list)):
-        return generate_city_test(shopping_list_size, number_of_shops, radius, max_q)
+        return generate_city_test(shopping_list_size, number_of_shops, radius, max_q, weights_scale, compact_weights)
 
     res["shops"] = shops
+
+    # weights computed on demand from the seed instead of the dictionary with all pairs of shops
+    if compact_weights:
+        res["weights"] = HashNoiseWeights(np.random.randint(2 ** 31), 1, weights_scale).to_dict()
+        return res
+
     weights_dict = {f"{idx}": {} for idx in range(0, len(shops) + 1)}
 
     for i in range(0, len(shops) + 1):
@@ -129,7 +119,7 @@ def generate_city_test(shopping_list_size=100, number_of_shops=500, radius=100,
     return res
 
 
-def generate_agglomeration_test(shopping_list_size=100, number_of_shops=500, radius=20):
+def generate_agglomeration_test(shopping_list_size=100, number_of_shops=500, radius=20, compact_weights=False):
     res = {}
     shopping_list = [i for i in range(1, shopping_list_size + 1)]
     start = {"x": 0, "y": 0}
@@ -157,9 +147,15 @@ def generate_agglomeration_test(shopping_list_size=100, number_of_shops=500, rad
         shops.append(shop_dict)
 
     if not set(check).issuperset(set(shopping_list)):
-        return generate_agglomeration_test(shopping_list_size, number_of_shops, radius)
+        return generate_agglomeration_test(shopping_list_size, number_of_shops, radius, compact_weights)
 
     res["shops"] = shops
+
+    # weights computed on demand from the seed instead of the dictionary with all pairs of shops
+    if compact_weights:
+        res["weights"] = HashNoiseWeights(np.random.randint(2 ** 31), 1, 0.05).to_dict()
+        return res
+
     weights_dict = {f"{idx}": {} for idx in range(0, len(shops) + 1)}
 
     for i in range(0, len(shops) + 1):
@@ -175,11 +171,9 @@ def generate_agglomeration_test(shopping_list_size=100, number_of_shops=500, rad
 def save_large_test_cases(n=10):
     for i in range(1, n + 1):
         res = generate_large_test()
-        with open(f"large_test_case_{i}.bin", "wb") as file:
-            pickle.dump(res, file)
+        save_binary(res, f"large_test_case_{i}.bin")
 
 
 if __name__ == "__main__":
-    with open("large_test_case_1.bin", "rb") as file:
-        res = pickle.load(file)
+    res = load_binary("large_test_case_1.bin")
 
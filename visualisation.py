@@ -0,0 +1,36 @@
+from typing import Dict, Union
+
+from solution import Solution
+
+
+def plot_shops(test_data: Dict, result: Union[Dict, Solution] = None) -> None:
+    """
+    Show the start point and shops and, if the solution is given, the route of the solution.
+    Matplotlib is imported only when the plot is drawn, so the solver does not depend on it.
+
+    :param test_data: dictionary with test data
+    :param result: dictionary with the solution (as returned by run.py) or the solution
+    """
+
+    try:
+        from matplotlib import pyplot as plt
+    except ImportError as error:
+        raise ImportError('matplotlib is required to plot shops') from error
+
+    start = test_data['start']['x'], test_data['start']['y']
+    positions = {shop['id']: (shop['x'], shop['y']) for shop in test_data['shops']}
+
+    plt.scatter(*start, c='red')
+    plt.annotate(0, start)
+    xs, ys = zip(*positions.values())
+    plt.scatter(xs, ys, c='blue')
+
+    for shop_id, position in positions.items():
+        plt.annotate(shop_id, position)
+
+    if result is not None:
+        route = result.route if isinstance(result, Solution) else [shop for shop, _ in result['solution']]
+        route_x, route_y = zip(start, *(positions[shop] for shop in route), start)
+        plt.plot(route_x, route_y)
+
+    plt.show()
@@ -0,0 +1,250 @@
+import math
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Tuple, Union
+
+import numpy as np
+
+MASK64 = (1 << 64) - 1
+
+
+class WeightModel(ABC):
+    """
+    Source of road weights w_ij. Weights are fetched on demand, so only the dense model needs memory
+    proportional to the square of the number of shops. All models except the dense matrix are symmetric.
+    """
+
+    def weight(self, i: int, j: int) -> float:
+        """
+        :return: weight of the road between nodes i and j (0 is the start point)
+        """
+
+        return float(self.weights(np.array([i]), np.array([j]))[0])
+
+    @abstractmethod
+    def weights(self, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        """
+        :return: weights of the roads between nodes from arrays i and j (arrays are broadcast together)
+        """
+
+    def matrix(self, size: int) -> np.ndarray:
+        """
+        :param size: number of nodes (number of shops + 1)
+        :return: dense weight matrix
+        """
+
+        i = np.arange(size)
+        return self.weights(i[:, np.newaxis], i[np.newaxis, :])
+
+    @abstractmethod
+    def to_dict(self) -> Dict:
+        """
+        :return: compact description of the model which can be saved in the test data instead of all weights
+        """
+
+
+class DenseWeights(WeightModel):
+    """
+    All weights stored in a matrix or, for symmetric weights, in the upper triangle of the matrix.
+    """
+
+    def __init__(self, values: np.ndarray, size: int = None):
+        """
+        :param values: dense weight matrix or its upper triangle without diagonal (row by row)
+        :param size: number of nodes (required only for the triangle)
+        """
+
+        self.values = values
+
+        if values.ndim == 1:
+            self.size = size if size is not None else int((1 + math.isqrt(1 + 8 * len(values))) // 2)
+        else:
+            self.size = len(values)
+
+    def weights(self, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        if self.values.ndim == 2:
+            return self.values[i, j]
+
+        i, j = np.broadcast_arrays(np.asarray(i), np.asarray(j))
+        lo, hi = np.minimum(i, j), np.maximum(i, j)
+        index = lo * (2 * self.size - lo - 1) // 2 + hi - lo - 1
+        return np.where(lo == hi, 0., self.values[np.where(lo == hi, 0, index)])
+
+    def weight(self, i: int, j: int) -> float:
+        if self.values.ndim == 2:
+            return float(self.values[i, j])
+        if i == j:
+            return 0.
+        lo, hi = min(i, j), max(i, j)
+        return float(self.values[lo * (2 * self.size - lo - 1) // 2 + hi - lo - 1])
+
+    def matrix(self, size: int) -> np.ndarray:
+        if self.values.ndim == 2:
+            return self.values
+        return triangle_to_dense(self.values, size)
+
+    def to_dict(self) -> Dict:
+        matrix = self.matrix(self.size)
+        return {str(i): {str(j): float(matrix[i, j]) for j in range(self.size) if j != i} for i in range(self.size)}
+
+
+class ConstantWeights(WeightModel):
+    """
+    The same weight of all roads.
+    """
+
+    def __init__(self, value: float = 1.):
+        self.value = value
+
+    def weight(self, i: int, j: int) -> float:
+        return self.value
+
+    def weights(self, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        return np.full(np.broadcast(np.asarray(i), np.asarray(j)).shape, self.value)
+
+    def to_dict(self) -> Dict:
+        return {'type': 'constant', 'value': self.value}
+
+
+def _splitmix64(x: int) -> int:
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+def _splitmix64_array(x: np.ndarray) -> np.ndarray:
+    with np.errstate(over='ignore'):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+class HashNoiseWeights(WeightModel):
+    """
+    Weights drawn from the normal distribution N(mean, scale^2) independently for every road, but computed
+    on demand from the hash of the seed and the road ends instead of being stored.
+    """
+
+    def __init__(self, seed: int, mean: float = 1., scale: float = 0.05):
+        self.seed = seed
+        self.mean = mean
+        self.scale = scale
+        self._key = _splitmix64(seed & MASK64)
+
+    def weight(self, i: int, j: int) -> float:
+        lo, hi = min(i, j), max(i, j)
+        first = _splitmix64(self._key ^ (lo << 32 | hi))
+        second = _splitmix64(first)
+        u1 = ((first >> 11) + 0.5) / 2 ** 53
+        u2 = (second >> 11) / 2 ** 53
+        return self.mean + self.scale * math.sqrt(-2 * math.log(u1)) * math.cos(2 * math.pi * u2)
+
+    def weights(self, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        i, j = np.asarray(i, dtype=np.uint64), np.asarray(j, dtype=np.uint64)
+        lo, hi = np.minimum(i, j), np.maximum(i, j)
+        first = _splitmix64_array(np.uint64(self._key) ^ (lo << np.uint64(32) | hi))
+        second = _splitmix64_array(first)
+        u1 = ((first >> np.uint64(11)).astype(np.float64) + 0.5) / 2 ** 53
+        u2 = (second >> np.uint64(11)).astype(np.float64) / 2 ** 53
+        return self.mean + self.scale * np.sqrt(-2 * np.log(u1)) * np.cos(2 * np.pi * u2)
+
+    def to_dict(self) -> Dict:
+        return {'type': 'hash_noise', 'seed': self.seed, 'mean': self.mean, 'scale': self.scale}
+
+
+class SparseWeights(WeightModel):
+    """
+    Weights of selected roads set explicitly on top of another model.
+    """
+
+    def __init__(self, default: WeightModel, overrides: Iterable[Tuple[int, int, float]] = ()):
+        """
+        :param default: model of weights of the roads without overrides
+        :param overrides: triples (i, j, weight) - roads with explicitly set weights
+        """
+
+        self.default = default
+        self.overrides = {}
+
+        for i, j, weight in overrides:
+            self.overrides[min(i, j), max(i, j)] = weight
+
+        keys = np.array(sorted(self.overrides), dtype=np.int64).reshape(-1, 2)
+        self._keys = keys[:, 0] << 32 | keys[:, 1]
+        self._values = np.array([self.overrides[tuple(key)] for key in keys.tolist()], dtype=np.float64)
+
+    def weight(self, i: int, j: int) -> float:
+        weight = self.overrides.get((min(i, j), max(i, j)))
+        return self.default.weight(i, j) if weight is None else weight
+
+    def weights(self, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        i, j = np.broadcast_arrays(np.asarray(i, dtype=np.int64), np.asarray(j, dtype=np.int64))
+        result = np.array(self.default.weights(i, j), dtype=np.float64)
+
+        if len(self._keys) > 0:
+            keys = np.minimum(i, j) << 32 | np.maximum(i, j)
+            index = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+            found = self._keys[index] == keys
+            result[found] = self._values[index[found]]
+
+        return result
+
+    def to_dict(self) -> Dict:
+        return {'type': 'sparse', 'default': self.default.to_dict(),
+                'overrides': [[i, j, weight] for (i, j), weight in self.overrides.items()]}
+
+
+def weight_model(description: Union[Dict, WeightModel], size: int) -> WeightModel:
+    """
+    Create the weight model from the test data.
+
+    :param description: nested dictionary with all weights (as in the JSON test data) or compact description
+                        created by WeightModel.to_dict()
+    :param size: number of nodes (number of shops + 1)
+    :return: weight model
+    """
+
+    if isinstance(description, WeightModel):
+        return description
+
+    model_type = description.get('type')
+
+    if model_type == 'constant':
+        return ConstantWeights(description['value'])
+    if model_type == 'hash_noise':
+        return HashNoiseWeights(description['seed'], description['mean'], description['scale'])
+    if model_type == 'sparse':
+        return SparseWeights(weight_model(description['default'], size), description['overrides'])
+    if model_type is not None:
+        raise ValueError(f'unknown weight model: {model_type}')
+
+    matrix = np.zeros((size, size), dtype=np.float64)
+
+    for i, row in description.items():
+        i = int(i)
+        for j, weight in row.items():
+            matrix[i, int(j)] = weight
+
+    return DenseWeights(matrix)
+
+
+def dense_to_triangle(matrix: np.ndarray) -> np.ndarray:
+    """
+    :param matrix: symmetric matrix
+    :return: upper triangle of the matrix without diagonal (row by row)
+    """
+
+    return matrix[np.triu_indices(len(matrix), k=1)]
+
+
+def triangle_to_dense(values: np.ndarray, size: int) -> np.ndarray:
+    """
+    :param values: upper triangle of a symmetric matrix without diagonal (row by row)
+    :param size: number of rows of the matrix
+    :return: symmetric matrix with zeros on the diagonal
+    """
+
+    matrix = np.zeros((size, size), dtype=values.dtype)
+    matrix[np.triu_indices(size, k=1)] = values
+    return matrix + matrix.T
@@ -0,0 +1,34 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable
+
+# data shared by all tasks run in the worker process (problem instance, network of shops), it is sent once
+# when the worker starts instead of with every task
+_shared = None
+
+
+def _init_worker(shared: Any) -> None:
+    global _shared
+    _shared = shared
+
+
+def shared_pool(shared: Any, workers: int = None) -> ProcessPoolExecutor:
+    """
+    :param shared: data sent once to every worker process
+    :param workers: number of worker processes (None means number of processors)
+    :return: pool of worker processes, tasks submitted with call_shared() get the shared data
+    """
+
+    return ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(shared,))
+
+
+def call_shared(function: Callable, *args) -> Any:
+    """
+    Task of the pool created by shared_pool(), e.g. executor.submit(call_shared, function, x, y).
+
+    :param function: function of the module level called with the shared data of the worker process
+                     as the first argument
+    :param args: other arguments of the function
+    :return: result of the function
+    """
+
+    return function(_shared, *args)